@@ -113,4 +113,6 @@ asm_ccount(void)
 #define BS_UART_SET_CONFIG              47
 #define BS_UART_GET_CONFIG              48
 #define BS_REPLY_UART_GET_CONFIG        49
+#define BS_CRC_DISABLE                  70 // 0x46, matches the client
+#define BS_REPLY_CRC_DISABLE            71
 #endif
@@ -15,6 +15,11 @@ static int g_dataBits = 8;
 static int g_stopBits = 1;
 static int g_parity   = -1; // -1: None, 0: Even, 1: Odd
 
+// Whether incoming request CRCs are checked; cleared by BS_CRC_DISABLE
+// when the host negotiates the frame CRC off (USB link-layer CRC is
+// already in effect). Reset to true on every reboot.
+static bool g_checkCrc = true;
+
 #define microsTime()  ((uint32_t)(asm_ccount() - (int32_t)usTicks)/FREQ)
 
 // Persistent state for the passthrough mode
@@ -189,7 +194,7 @@ loop()
     }
     
     request->bs_checksum = 0;
-    if (crc_mem((char *)request, BS_HEADER_SIZE + request->bs_payload_length) != header.bs_checksum) {
+    if (g_checkCrc && crc_mem((char *)request, BS_HEADER_SIZE + request->bs_payload_length) != header.bs_checksum) {
       return;
     }
     if (request->bs_sequence_number <= sequence_number)
@@ -317,14 +322,30 @@ loop()
     case BS_SPI_ENABLE_WP:
       reply  = enable_write_protection(request);
       break;
-      
+
+    case BS_CRC_DISABLE:
+      // Host offers to drop the frame CRC. The request (and the ack
+      // below) still carry a valid CRC; only requests after the ack
+      // arrive with a zero checksum.
+      reply = (struct bs_frame_s *)malloc(BS_HEADER_SIZE);
+      if (reply != NULL) {
+        reply->bs_command = BS_REPLY_CRC_DISABLE;
+        reply->bs_payload_length = 0;
+        g_checkCrc = false;
+      }
+      break;
+
     default:
       reply = NULL;
       break;
     }
 
     reset_gpios();
-    send_reply(request, reply);
+    // Unhandled (or malloc-starved) commands produce no reply rather
+    // than dereferencing NULL in send_reply; the host times out and
+    // falls back on its own.
+    if (reply != NULL)
+      send_reply(request, reply);
     free(reply);
     free(request);
 }
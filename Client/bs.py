@@ -16,10 +16,12 @@ import struct
 import os
 import sys
 import serial
-import binascii
+import zlib
 import select
 import termios
 import fcntl
+import atexit
+import array
 
 # Module-global state used by the simple client. These are mutated by
 # Connect(), requestreply(), and the sequence-number helpers.
@@ -33,6 +35,19 @@ baudrate = 500000  # serial baud rate to open the device with
 # define squence number file path
 sequence_file_path = os.path.expanduser("~/.BUSSide/sequence")
 
+# Precompiled Struct objects for the hot frame formats; avoids re-parsing
+# the format strings on every request/reply.
+_U32 = struct.Struct("<I")
+_HDR4 = struct.Struct("<IIII")
+
+# On USB-CDC transports the link layer already CRC-protects every packet,
+# making the host-side CRC32 redundant. When this flag is set (via the
+# BUSSIDE_NO_CRC environment variable), Connect() offers to disable it
+# (command 0x46); the CRC passes are skipped only if the firmware ACKs,
+# so an older firmware that never replies leaves CRC enabled.
+DISABLE_HOST_CRC = os.environ.get("BUSSIDE_NO_CRC", "0") not in ("", "0")
+_crc_enabled = True
+
 def keys_isData():
     """Return True if a character is available on stdin (non-blocking).
 
@@ -69,15 +84,21 @@ def keys_init():
 
 
 def keys_getchar():
-    """Read a single character from stdin if available, otherwise None.
+    """Read a single byte from stdin if available, otherwise None.
 
-    This is a non-blocking convenience wrapper around keys_isData() and
-    sys.stdin.read(1). Returns a single-character string or None.
+    keys_init() already put stdin into non-blocking mode, so one os.read
+    suffices: no select syscall or fd-set construction per poll. Returns
+    the raw byte (a bytes object of length 1) or None; callers forward
+    it to the wire unchanged, so no decode/encode round trip that would
+    mangle bytes >= 0x80 or split multi-byte UTF-8 input.
     """
-    if keys_isData():
-        return sys.stdin.read(1)
-    else:
+    try:
+        b = os.read(sys.stdin.fileno(), 1)
+    except BlockingIOError:
+        return None
+    if not b:
         return None
+    return b
 
 
 def keys_cleanup():
@@ -129,19 +150,46 @@ def ResetDevice():
     except Exception as e:
         print(f"--- Warning: Could not reset hardware: {e}")
 
+def _persist_sequence_number():
+    """Atomically write the current sequence number to its file.
+
+    Writes a temp file in the same directory, fsyncs it and renames it
+    over the real one, so a crash mid-write can never leave a truncated
+    or zero-byte counter behind. The periodic cadence in
+    next_sequence_number() keeps this off the per-request path.
+    """
+    tmp_path = sequence_file_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(sequence_file_path), exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, _U32.pack(sequence_number))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.rename(tmp_path, sequence_file_path)
+    except OSError:
+        return
+
+
+# Make sure the latest value is durable on clean exit even between the
+# periodic persists below.
+atexit.register(_persist_sequence_number)
+
+
 def next_sequence_number():
-    """Advance the sequence number and persist it to .
+    """Advance the sequence number and persist it periodically.
 
-    The sequence number is advanced modulo 2^30 to keep it bounded, then
-    the new value is written (little-endian) to a temporary file. Writing
-    to a file allows other processes or subsequent runs to pick up the
-    current sequence value for debugging or crash recovery.
+    The sequence number is advanced modulo 2^30 to keep it bounded. To
+    avoid a persist per request during flash dumps, the value is only
+    written out (atomically, via _persist_sequence_number) every 256th
+    increment; an atexit hook persists the final value on exit.
     """
     global sequence_number
 
     sequence_number = (sequence_number + 1) % (1 << 30)
-    with open(sequence_file_path, "wb") as f:
-        f.write(struct.pack("<I", sequence_number))
+    if sequence_number & 0xFF == 0:
+        _persist_sequence_number()
 
 
 def FlushInput():
@@ -152,10 +200,42 @@ def FlushInput():
     bytes (boot messages, garbled data) before starting protocol frames.
     """
     global myserial
+    global _rx_pending
 
+    _rx_pending = b""
     myserial.flushInput()
 
 
+# Bytes read past the sync marker by Sync()'s bulk scan; consumed before
+# any fresh serial reads so reply headers are never lost.
+_rx_pending = b""
+
+
+# Preallocated receive buffer sized for the largest sane reply (65356
+# bytes) plus the 16-byte header; replies are read straight into it so
+# no per-reply bytes objects are allocated.
+_rx_buf = bytearray(65356 + 16)
+
+
+def _serial_readinto(mv):
+    """Fill the memoryview `mv` completely, draining Sync() leftovers
+    first. Returns the number of bytes actually placed in `mv`."""
+    global _rx_pending
+
+    n = 0
+    if _rx_pending:
+        take = _rx_pending[: len(mv)]
+        mv[: len(take)] = take
+        _rx_pending = _rx_pending[len(take):]
+        n = len(take)
+    while n < len(mv):
+        got = myserial.readinto(mv[n:])
+        if not got:
+            break
+        n += got
+    return n
+
+
 def Sync():
     """Wait for the device to send the two-byte sync marker 0xFE 0xCA.
 
@@ -166,27 +246,41 @@ def Sync():
     global myserial, mytimeout
     # Give the hardware a moment to finish its "Welcome" speech
     # and look for the magic bytes
-    start_time = time.time()
+    start_time = time.monotonic()
     print("+++ Hunting for sync bytes (0xFE 0xCA)...")
 
-    while (time.time() - start_time) < mytimeout:
-        char1 = myserial.read(1)
-        if not char1:
-            # Nothing read: continue polling until timeout
+    # Read whatever is pending in one go and scan it with bytes.find
+    # instead of pulling single bytes through the interpreter. Buffered
+    # leftovers from a previous over-read are scanned before any fresh
+    # serial read: in the pipelined paths a whole later reply can be
+    # sitting in _rx_pending with no further traffic due on the wire.
+    # Keep the last byte across reads in case the marker straddles two
+    # chunks; anything after the marker is kept for the reply-header
+    # reads.
+    global _rx_pending
+    tail = _rx_pending
+    _rx_pending = b""
+    while True:
+        idx = tail.find(b"\xfe\xca")
+        if idx != -1:
+            _rx_pending = tail[idx + 2:]
+            print("+++ Sync Achieved!")
+            return True
+        if (time.monotonic() - start_time) >= mytimeout:
+            break
+        chunk = myserial.read(max(1, myserial.in_waiting))
+        if not chunk:
+            # Nothing read: keep polling until timeout
             continue
-
-        # `char1` is a bytes object; index 0 gives the integer value
-        if char1[0] == 0xFE:
-            # If first byte matches, attempt to read the second byte
-            char2 = myserial.read(1)
-            if char2 and char2[0] == 0xCA:
-                print("+++ Sync Achieved!")
-                return True
+        tail = tail[-1:] + chunk
+    # Put whatever we didn't consume back so a timeout doesn't destroy
+    # bytes that belong to a reply still to be read.
+    _rx_pending = tail
     print("--- Sync Timeout: Magic bytes not found.")
     return False
 
 
-def requestreply(command, request_args, nretries=10):
+def requestreply(command, request_args, nretries=10, request_bytes=None):
     """Send a framed request and wait for a validated reply.
 
     Frame format used by this client (little-endian 32-bit words):
@@ -203,17 +297,31 @@ def requestreply(command, request_args, nretries=10):
     length, CRC and sequence number. On success it returns a tuple
     (reply_length, reply_args_list) where `reply_args_list` is a list of
     decoded uint32 values. Returns None after exhausting retries.
+
+    Callers that already hold the payload as little-endian bytes (e.g. an
+    `array.array('I').tobytes()` or raw file data) can pass it via
+    `request_bytes` to skip the per-call serialization of `request_args`.
     """
     global myserial
     global mydevice
     global mytimeout
 
+    # Callers print a status line and then sit in this round trip for up
+    # to the full timeout; with stdout block-buffered that line would
+    # stay invisible the whole time, so push it out before blocking.
+    sys.stdout.flush()
+
     # Ensure we have an open serial connection; attempt Connect() if not
     if myserial is None:
         rv = Connect()
         if rv is None:
             return None
 
+    # Serialize the payload once, outside the retry loop; it never
+    # changes between attempts.
+    if request_bytes is None:
+        request_bytes = struct.pack("<%dI" % len(request_args), *request_args)
+
     for i in range(nretries):
         if i > 0:
             print("+++ Retransmitting %d/10" % (i))
@@ -221,100 +329,21 @@ def requestreply(command, request_args, nretries=10):
             # recover from a stuck device or corrupted state.
             if i > 3:
                 FlushInput()
-                time.sleep(5)
+                # Exponential backoff from 50 ms instead of a flat 5 s:
+                # transient glitches recover quickly, persistent faults
+                # still back off towards the reconnect path.
+                time.sleep(min(2.0, 0.05 * (1 << (i - 3))))
                 rv = Connect(mydevice, mytimeout, 0)
                 if rv is None:
                     continue
 
-        # build the frame pieces
-        bs_sync = b"\xfe\xca"  # always prefix frames with this marker
-        bs_command = struct.pack("<I", command)
-        # payload length in bytes (4 bytes per uint32 argument)
-        bs_command_length = struct.pack("<I", len(request_args) * 4)
-        bs_request_args = b""
-        for j in range(len(request_args)):
-            bs_request_args += struct.pack("<I", request_args[j])
-
-        # calculate crc over command + length + sequence + zero + args
-        # Note: a zero placeholder is used in the pre-CRC layout.
-        request = bs_command
-        request += bs_command_length
-        saved_sequence_number = get_sequence_number()
-        # Advance the saved sequence for the next outgoing request
-        next_sequence_number()
-        request += struct.pack("<I", saved_sequence_number)
-        request += struct.pack("<I", 0x00000000)
-        request += bs_request_args
-        crc = binascii.crc32(request) & 0xFFFFFFFF
-
-        # now build the on-wire frame: command, length, seq, crc, args
-        request = bs_command
-        request += bs_command_length
-        request += struct.pack("<I", saved_sequence_number)
-        request += struct.pack("<I", crc)
-        request += bs_request_args
-        # send the sync marker plus the serialized frame
-        myserial.write(bs_sync + request)
-        myserial.flush()
-
-        # wait for device to send the 0xFE 0xCA sync back before reading
-        if not Sync():
-            # device didn't respond with sync marker; retry
-            continue
+        saved_sequence_number = _send_request(command, request_bytes)
 
-        # read reply header fields (all little-endian 32-bit words)
-        bs_command = myserial.read(4)
-        if len(bs_command) != 4:
-            continue
-        bs_reply_length = myserial.read(4)
-        if len(bs_reply_length) != 4:
-            continue
-        (reply_length,) = struct.unpack("<I", bs_reply_length)
-        # sanity-check to avoid reading enormous lengths
-        if reply_length > 65356:
-            continue
-        bs_sequence_number = myserial.read(4)
-        if len(bs_sequence_number) != 4:
-            continue
-        (seq,) = struct.unpack("<I", bs_sequence_number)
-        d = myserial.read(4)
-        if len(d) != 4:
-            continue
-        (bs_checksum,) = struct.unpack("<I", d)
-
-        # read reply payload (reply_length bytes, expected to be multiple
-        # of 4 since arguments are 4-byte words)
-        reply_args = b""
-        if reply_length == 0:
-            bs_reply_args = []
-        else:
-            # Prepare a list sized for the expected number of args
-            bs_reply_args = list(range(reply_length // 4))
-            fail = False
-            for j in range(reply_length // 4):
-                s = myserial.read(4)
-                if len(s) != 4:
-                    fail = True
-                    break
-                reply_args += s
-                (bs_reply_args[j],) = struct.unpack("<I", s)
-            if fail:
-                # incomplete payload; try the whole request again
-                continue
-
-        # calculate checksum on the received parts (same layout as when
-        # the device calculated it: command + length + seq + zero + args)
-        reply = bs_command
-        reply += bs_reply_length
-        reply += bs_sequence_number
-        reply += struct.pack("<I", 0x00000000)
-        reply += reply_args
-        crc = binascii.crc32(reply) & 0xFFFFFFFF
-
-        # verify CRC and sequence number
-        if crc != bs_checksum:
-            # bad frame checksum
+        rv = _read_one_reply()
+        if rv is None:
+            # no sync, short read, or bad checksum; retry
             continue
+        (seq, reply_length, bs_reply_args) = rv
         if saved_sequence_number != seq:
             # sequence mismatch (stale/duplicate reply)
             continue
@@ -326,6 +355,172 @@ def requestreply(command, request_args, nretries=10):
     return None
 
 
+def _send_request(command, request_bytes):
+    """Serialize and transmit one framed request; returns its sequence.
+
+    Builds the on-wire frame once in a mutable buffer with a zero CRC
+    placeholder, runs the CRC over it, then patches the CRC in place -
+    one buffer serves both the CRC pass and the send. No explicit flush:
+    the frame goes out in a single write and draining the port per
+    request costs an extra syscall each time (Connect() still flushes
+    once after the handshake).
+    """
+    saved_sequence_number = get_sequence_number()
+    # Advance the saved sequence for the next outgoing request
+    next_sequence_number()
+
+    frame = bytearray(16 + len(request_bytes))
+    _HDR4.pack_into(frame, 0, command, len(request_bytes), saved_sequence_number, 0)
+    frame[16:] = request_bytes
+    if _crc_enabled:
+        crc = zlib.crc32(frame) & 0xFFFFFFFF
+        _U32.pack_into(frame, 12, crc)
+
+    # Gather-write the sync marker and the frame in one syscall without
+    # concatenating them into a fresh bytes object; platforms without
+    # writev (Windows) fall back to the plain concatenated write.
+    if hasattr(os, "writev"):
+        try:
+            n = os.writev(myserial.fileno(), [b"\xfe\xca", frame])
+        except BlockingIOError:
+            # pyserial keeps the fd non-blocking, so a momentarily full
+            # tty output buffer surfaces as EAGAIN here; pyserial's own
+            # write() does the select-and-retry for us.
+            myserial.write(b"\xfe\xca" + bytes(frame))
+        else:
+            if n != 2 + len(frame):
+                # partial gather write; finish the remainder through
+                # pyserial's own write loop
+                myserial.write((b"\xfe\xca" + bytes(frame))[n:])
+    else:
+        myserial.write(b"\xfe\xca" + bytes(frame))
+    return saved_sequence_number
+
+
+def _read_one_reply():
+    """Wait for sync and read one CRC-validated reply.
+
+    Returns (seq, reply_length, reply_args) or None on timeout, short
+    read, oversized length, or checksum mismatch. `reply_args` is an
+    array.array of uint32 words - it indexes and slices like the list it
+    replaces, and bulk consumers get the raw bytes via .tobytes()
+    without a per-word unpack/repack round trip. The caller is
+    responsible for matching `seq` against its outstanding request(s).
+    """
+    # wait for device to send the 0xFE 0xCA sync back before reading
+    if not Sync():
+        return None
+
+    # read the reply header (four little-endian 32-bit words) straight
+    # into the preallocated receive buffer - no per-reply allocation
+    mv = memoryview(_rx_buf)
+    if _serial_readinto(mv[:16]) != 16:
+        return None
+    (_, reply_length, seq, bs_checksum) = _HDR4.unpack_from(_rx_buf, 0)
+    # sanity-check to avoid reading enormous lengths
+    if reply_length > 65356:
+        return None
+
+    # read the whole reply payload at once (reply_length bytes,
+    # expected to be a multiple of 4 since arguments are 4-byte words)
+    if reply_length == 0:
+        reply_args = b""
+        bs_reply_args = array.array("I")
+    else:
+        if _serial_readinto(mv[16 : 16 + reply_length]) != reply_length:
+            # incomplete payload
+            return None
+        reply_args = mv[16 : 16 + reply_length]
+        # One C-level copy out of the receive buffer; the words stay in a
+        # compact machine array instead of being boxed into a list of ints
+        bs_reply_args = array.array("I")
+        bs_reply_args.frombytes(reply_args)
+        if sys.byteorder != "little":
+            bs_reply_args.byteswap()
+
+    # calculate checksum on the received parts (same layout as when
+    # the device calculated it: command + length + seq + zero + args);
+    # feed zlib.crc32 incrementally over views of the receive buffer
+    if _crc_enabled:
+        crc = zlib.crc32(mv[0:12])
+        crc = zlib.crc32(b"\x00\x00\x00\x00", crc)
+        crc = zlib.crc32(reply_args, crc) & 0xFFFFFFFF
+        if crc != bs_checksum:
+            # bad frame checksum
+            return None
+
+    return (seq, reply_length, bs_reply_args)
+
+
+def requestreply_pipelined(command, arg_lists, window=4):
+    """Pipeline several requests, keeping up to `window` in flight.
+
+    Sends `window` frames back-to-back, then yields one validated reply
+    per entry of `arg_lists`, in submission order, topping the window
+    back up after each reply. The device processes requests in order, so
+    each received reply is matched against the oldest outstanding
+    sequence number; on any mismatch or timeout the remaining in-flight
+    requests are redone one at a time via requestreply(). Yields
+    (reply_length, reply_args) tuples, or None for a request that failed
+    even after the synchronous retries.
+    """
+    n = len(arg_lists)
+    pending = []  # FIFO of (sequence_number, index into arg_lists)
+    sent = 0
+
+    while pending or sent < n:
+        # keep the window full
+        while sent < n and len(pending) < window:
+            request_bytes = struct.pack(
+                "<%dI" % len(arg_lists[sent]), *arg_lists[sent]
+            )
+            pending.append((_send_request(command, request_bytes), sent))
+            sent += 1
+
+        rv = _read_one_reply()
+        if rv is not None and rv[0] == pending[0][0]:
+            pending.pop(0)
+            yield (rv[1], rv[2])
+            continue
+
+        # Pipeline broken (lost/corrupt reply): drop everything still in
+        # flight and redo those requests individually with retries.
+        FlushInput()
+        for _, idx in pending:
+            yield requestreply(command, arg_lists[idx])
+        pending = []
+
+
+def send_request_only(command, request_args):
+    """Transmit a framed request and return immediately, without waiting
+    for (or consuming) the firmware's reply.
+
+    Returns the request's sequence number. The reply, if any, is left on
+    the wire: callers must either collect it later via the pipelined
+    machinery or FlushInput() before the next synchronous request.
+    """
+    global myserial
+
+    if myserial is None:
+        rv = Connect()
+        if rv is None:
+            return None
+    request_bytes = struct.pack("<%dI" % len(request_args), *request_args)
+    return _send_request(command, request_bytes)
+
+
+def requestreply_raw(command, header_args, payload_bytes, nretries=10):
+    """Send a request whose bulk payload is already little-endian bytes.
+
+    `header_args` is a short list of uint32 values serialized ahead of
+    `payload_bytes`, which is forwarded verbatim as the remainder of the
+    payload. This lets file data flow to the wire without the usual
+    bytes -> uint32 list -> bytes round trip.
+    """
+    header = struct.pack("<%dI" % len(header_args), *header_args)
+    return requestreply(command, [], nretries, request_bytes=header + payload_bytes)
+
+
 def getSerial():
     """Return the current pySerial object (or None if not connected)."""
     global myserial
@@ -360,8 +555,17 @@ def Connect(device, ltimeout=2, nretries=10):
     global myserial
     global mytimeout
     global mydevice
+    global _crc_enabled
 
     print(f"+++ Connecting to the BUSSide on {device}")
+    # CRC32 runs through the system zlib; recent zlib/zlib-ng builds use
+    # hardware carry-less-multiply folding, which matters at large block
+    # sizes. Print the version so users can tell what they're running.
+    print(f"+++ Using zlib {zlib.ZLIB_VERSION} for frame CRCs")
+
+    # A (re)connect means the firmware may have rebooted with CRC
+    # checking back on; re-negotiate below if requested.
+    _crc_enabled = True
 
     # Close any existing serial handle before (re)opening
     if myserial is not None:
@@ -403,6 +607,11 @@ def Connect(device, ltimeout=2, nretries=10):
                     print("--- Echo failed, retrying...")
                     myserial.close()
                     continue
+                # Drain the port once so the handshake is fully on the wire
+                # before returning; steady-state requests skip this.
+                myserial.flush()
+                if DISABLE_HOST_CRC:
+                    _negotiate_crc_disable()
                 # print("+++ OK")
                 return rv
             return (1, 1)
@@ -412,6 +621,22 @@ def Connect(device, ltimeout=2, nretries=10):
     return None
 
 
+def _negotiate_crc_disable():
+    """Offer to drop host-side CRC (command 0x46); keep it on NAK.
+
+    The request itself is always sent with a valid CRC. Only when the
+    firmware acknowledges do both ends stop checking, so an older
+    firmware that ignores the command simply leaves CRC enabled.
+    """
+    global _crc_enabled
+
+    _crc_enabled = True
+    rv = requestreply(0x46, [], 1)
+    if rv is not None:
+        _crc_enabled = False
+        print("+++ Host CRC disabled (link-layer CRC in effect)")
+
+
 def set_led_blink(interval_ms):
     """Set LED blink interval in milliseconds. 0 to stop blinking."""
     # print(f"+++ Setting LED blink interval to {interval_ms}ms")
@@ -8,9 +8,15 @@ It supports discovering I2C slaves, dumping and writing flash memory over I2C.
 """
 
 import bs
-import struct
-
-BLOCKSIZE = 1024  # Block size for dumping data in bytes
+import array
+import os
+
+# Block size for dumping data in bytes. Each block costs a full request
+# round trip (sync, header, CRC), so larger blocks amortize that fixed
+# overhead. The firmware mallocs each reply from the ESP8266 heap, so
+# stay well below the free-heap ceiling; 4 KiB is a safe default.
+# Override with the BUSSIDE_BLOCKSIZE environment variable if needed.
+BLOCKSIZE = int(os.environ.get("BUSSIDE_BLOCKSIZE", 4096))
 WRITEBLOCKSIZE = 512  # Block size for writing data in bytes
 
 
@@ -79,60 +85,46 @@ def doFlashCommand(command):
     Returns:
         int or None: 0 on success, None on invalid command.
     """
-    if command.find("dump ") == 0:
-        args = command[5:].split()
-        if len(args) != 6:
-            return None
-        i2c_dump_flash(
-            int(args[0]),
-            int(args[1]),
-            int(args[2]),
-            int(args[3]),
-            int(args[4]),
-            args[5],
-        )
-        return 0
-    elif command.find("write ") == 0:
-        args = command[6:].split()
-        if len(args) != 6:
-            return None
-        i2c_write_flash(
-            int(args[0]),
-            int(args[1]),
-            int(args[2]),
-            int(args[3]),
-            int(args[4]),
-            args[5],
-        )
-        return 0
-    else:
+    op, _, rest = command.partition(" ")
+    handler = _FLASH_HANDLERS.get(op)
+    if handler is None:
         return None
+    args = rest.split()
+    if len(args) != 6:
+        return None
+    handler(*map(int, args[:5]), args[5])
+    return 0
 
 
 def doCommand(command):
     """
     Main command dispatcher for I2C operations.
 
+    Tokenizes the command once and dispatches on the leading word(s)
+    instead of scanning the whole string per candidate prefix.
+
     Args:
         command (str): The command string to execute.
 
     Returns:
         int or None: 0 on success, None on invalid command.
     """
-    if command.find("flash ") == 0:
-        doFlashCommand(command[6:])
+    op, _, rest = command.partition(" ")
+    if op == "flash":
+        doFlashCommand(rest)
         return 0
-    elif command == "discover pinout":
-        i2c_discover()
-        return 0
-    elif command.find("discover slaves ") == 0:
-        args = command[16:].split()
-        if len(args) != 2:
-            return None
-        i2c_discover_slaves(int(args[0]), int(args[1]))
-        return 0
-    else:
-        return None
+    elif op == "discover":
+        sub, _, subargs = rest.partition(" ")
+        if sub == "pinout" and not subargs:
+            i2c_discover()
+            return 0
+        elif sub == "slaves":
+            args = subargs.split()
+            if len(args) != 2:
+                return None
+            i2c_discover_slaves(int(args[0]), int(args[1]))
+            return 0
+    return None
 
 
 def writeI2C(sda, scl, slave, size, skip, alen, data):
@@ -151,18 +143,11 @@ def writeI2C(sda, scl, slave, size, skip, alen, data):
     Returns:
         tuple: Reply from the BUSSide device.
     """
-    # Preallocate a list of integers for the request arguments
-    num_words = size // 4
-    request_args = [0] * (6 + num_words)
-    request_args[0] = slave
-    request_args[1] = size
-    request_args[2] = skip
-    request_args[3] = sda
-    request_args[4] = scl
-    request_args[5] = alen
-    for i in range(num_words):
-        request_args[6 + i] = data[i]
-    rv = bs.requestreply(25, request_args)
+    # Serialize the fixed header and the payload words as C-level bulk
+    # copies and hand the pre-built bytes straight to requestreply.
+    header = array.array("I", [slave, size, skip, sda, scl, alen])
+    payload = array.array("I", data[: size // 4])
+    rv = bs.requestreply(25, [], request_bytes=header.tobytes() + payload.tobytes())
     return rv
 
 
@@ -181,16 +166,15 @@ def dumpI2C(sda, scl, slave, size, skip, alen):
     Returns:
         bytes: The dumped data, or None if failed.
     """
-    data = b""
     request_args = [slave, size, skip, sda, scl, alen]
     rv = bs.requestreply(9, request_args)
     if rv is None:
         return None
     (bs_reply_length, bs_reply_args) = rv
-    # Assemble raw bytes from returned uint32 words
-    for i in range(bs_reply_length // 4):
-        data = data + struct.pack("<I", bs_reply_args[i])
-    return data
+    # The reply words arrive as an array.array, so the raw bytes come out
+    # in one C-level copy with no per-word unpacking.
+    nwords = bs_reply_length // 4
+    return bs_reply_args[:nwords].tobytes()
 
 
 def i2c_dump_flash(sda, scl, slave, alen, dumpsize, outfile):
@@ -210,21 +194,31 @@ def i2c_dump_flash(sda, scl, slave, alen, dumpsize, outfile):
     """
     skip = 0
     print("+++ Dumping I2C")
-    with open(outfile, "wb") as f:
-        while dumpsize > 0:
-            if dumpsize < BLOCKSIZE:
-                size = dumpsize
-            else:
-                size = BLOCKSIZE
-            data = dumpI2C(sda, scl, slave, size, skip, alen)
-            if data is None:
+    # Precompute the per-block request arguments so the transfers can be
+    # pipelined with several requests in flight instead of a strict
+    # request/wait/request ping-pong per 1 KiB block.
+    blocks = []
+    while dumpsize > 0:
+        if dumpsize < BLOCKSIZE:
+            size = dumpsize
+        else:
+            size = BLOCKSIZE
+        blocks.append([slave, size, skip, sda, scl, alen])
+        # advance by the actual transferred size
+        skip += size
+        dumpsize -= size
+    # Large write buffer and no per-block flush: the OS coalesces the
+    # writes and a single flush at the end keeps the data-on-disk
+    # guarantee before success is reported.
+    with open(outfile, "wb", buffering=1 << 20) as f:
+        for rv in bs.requestreply_pipelined(9, blocks):
+            if rv is None:
                 print("Timeout")
                 return None
-            f.write(data)
-            f.flush()
-            # advance by the actual transferred size
-            skip += size
-            dumpsize -= size
+            (bs_reply_length, bs_reply_args) = rv
+            nwords = bs_reply_length // 4
+            f.write(bs_reply_args[:nwords].tobytes())
+        f.flush()
         print("+++ I2C Dump Successfully Completed\n")
         return (1, 1)
 
@@ -255,18 +249,11 @@ def i2c_write_flash(sda, scl, slave, alen, dumpsize, infile):
                 size = WRITEBLOCKSIZE
             f.seek(skip)
             rawdata = f.read(size)
-            # Convert raw bytes into uint32 words. Python3: indexing bytes
-            # yields ints, so `ord()` is not required. Use integer division
-            # so sizes are ints.
-            num_words = size // 4
-            data = [0] * num_words
-            for i in range(num_words):
-                a = rawdata[4 * i + 0]
-                b = rawdata[4 * i + 1]
-                c = rawdata[4 * i + 2]
-                d = rawdata[4 * i + 3]
-                data[i] = (d << 24) + (c << 16) + (b << 8) + a
-            rv = writeI2C(sda, scl, slave, size, skip, alen, data)
+            # The file data is already little-endian on the wire, so pass
+            # the bytes straight through without a uint32 round trip.
+            rv = bs.requestreply_raw(
+                25, [slave, size, skip, sda, scl, alen], rawdata[: (size // 4) * 4]
+            )
             if rv is None:
                 print("Timeout")
                 return None
@@ -275,3 +262,11 @@ def i2c_write_flash(sda, scl, slave, alen, dumpsize, infile):
             dumpsize -= size
         print("+++ I2C Write Flash Command Successfully Completed\n")
         return (1, 1)
+
+
+# Flash subcommand dispatch table; both handlers take five ints plus an
+# input/output file path.
+_FLASH_HANDLERS = {
+    "dump": i2c_dump_flash,
+    "write": i2c_write_flash,
+}
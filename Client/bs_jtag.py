@@ -37,12 +37,14 @@ def jtag_discover_pinout():
 
         for i in range(num_found):
             base = 1 + (i * 5)
+            # one slice + unpack instead of five subscript operations
+            tck, tms, tdi, tdo, ntrst = bs_reply_args[base : base + 5]
             print(f"--- Interface #{i+1}:")
-            print(f"    TCK:   GPIO {bs_reply_args[base]}")
-            print(f"    TMS:   GPIO {bs_reply_args[base+1]}")
-            print(f"    TDI:   GPIO {bs_reply_args[base+2]}")
-            print(f"    TDO:   GPIO {bs_reply_args[base+3]}")
-            print(f"    nTRST: GPIO {bs_reply_args[base+4]}")
+            print(f"    TCK:   GPIO {tck}")
+            print(f"    TMS:   GPIO {tms}")
+            print(f"    TDI:   GPIO {tdi}")
+            print(f"    TDO:   GPIO {tdo}")
+            print(f"    nTRST: GPIO {ntrst}")
     elif num_found > 0:
         print(f"--- Warning: Found {num_found} interfaces, but received incomplete data (Length: {len(bs_reply_args)})")
     else:
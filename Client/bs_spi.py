@@ -1,604 +1,684 @@
-#!/usr/bin/env python3
-
-"""
-BUSSide SPI Client Script
-
-This script provides functions to interact with SPI devices using the BUSSide hardware.
-It supports discovering SPI pinouts, reading/writing flash memory, fuzzing commands,
-and various SPI operations like reading IDs, status registers, and unique IDs.
-"""
-
-import bs
-import struct
-
-BLOCKSIZE = 1024  # Block size for dumping data in bytes
-WRITEBLOCKSIZE = 256  # Block size for writing data in bytes
-
-
-def dumpSPI(size, skip):
-    """
-    Dump data from SPI device.
-
-    Args:
-        size (int): Size of data to dump in bytes.
-        skip (int): Offset to start dumping from.
-
-    Returns:
-        bytes: The dumped data, or None if failed.
-    """
-    request_args = [size, skip, 1000000]
-    rv = bs.requestreply(1, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    data = b""
-    # Python 3: // for integer division
-    for i in range(bs_reply_length // 4):
-        data = data + struct.pack("<I", bs_reply_args[i])
-    return data
-
-
-def spi_dump_flash(dumpsize, outfile):
-    """
-    Dump SPI flash memory to a file.
-
-    Args:
-        dumpsize (int): Total size to dump in bytes.
-        outfile (str): Output file path.
-
-    Returns:
-        tuple or None: (1, 1) on success, None on failure.
-    """
-    bs.NewTimeout(5)
-    skip = 0
-    print("+++ Dumping SPI")
-    try:
-        with open(outfile, "wb") as f:
-            while dumpsize > 0:
-                size = min(dumpsize, BLOCKSIZE)
-                data = dumpSPI(size, skip)
-                if data is None:
-                    print("--- Timeout during dump")
-                    return None
-                f.write(data)
-                f.flush()
-                skip += size
-                dumpsize -= size
-        print("+++ SPI Dump Command Successfully Completed\n")
-    except Exception as e:
-        print(f"--- File Error: {e}")
-    return (1, 1)
-
-
-def spi_read_id():
-    """
-    Read SPI device ID.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI read ID command")
-    request_args = [1000000]
-    rv = bs.requestreply(17, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    v1 = bs_reply_args[0]
-    v2 = bs_reply_args[1]
-    v3 = bs_reply_args[2]
-    print("+++ SPI ID %.2x%.2x%.2x" % (v1, v2, v3))
-    print("+++ SPI Read ID Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def writeSPI(size, skipsize, data):
-    """
-    Write data to SPI device.
-
-    Args:
-        size (int): Size of data to write in bytes.
-        skipsize (int): Offset to start writing at.
-        data (list): List of uint32 words to write.
-
-    Returns:
-        tuple: Reply from the BUSSide device.
-    """
-    # Python 3: Ensure integer division for range
-    num_data_ints = size // 4
-    request_args = [0] * (3 + num_data_ints)
-    request_args[0] = size
-    request_args[1] = skipsize
-    request_args[2] = 1000000
-    for i in range(num_data_ints):
-        request_args[3 + i] = data[i]
-    rv = bs.requestreply(37, request_args)
-    return rv
-
-
-def spi_flash(dumpsize, infile):
-    """
-    Write data from a file to SPI flash memory.
-
-    Args:
-        dumpsize (int): Total size to write in bytes.
-        infile (str): Input file path.
-
-    Returns:
-        tuple or None: (1, 1) on success, None on failure.
-    """
-    bs.NewTimeout(5)
-    skip = 0
-    print("+++ Writing SPI")
-    try:
-        with open(infile, "rb") as f:
-            while dumpsize > 0:
-                size = min(dumpsize, WRITEBLOCKSIZE)
-                f.seek(skip)
-                rawdata = f.read(size)
-
-                # Ensure we have enough data to fill 4-byte chunks
-                num_chunks = size // 4
-                data = [0] * num_chunks
-                for i in range(num_chunks):
-                    # Python 3: indexing bytes returns ints directly
-                    a = rawdata[4 * i + 0]
-                    b = rawdata[4 * i + 1]
-                    c = rawdata[4 * i + 2]
-                    d = rawdata[4 * i + 3]
-                    data[i] = (d << 24) + (c << 16) + (b << 8) + a
-
-                rv = writeSPI(size, skip, data)
-                if rv is None:
-                    print("--- Timeout during write")
-                    return None
-                skip += size
-                dumpsize -= size
-        print("+++ SPI Flash Command Successfully Completed\n")
-    except Exception as e:
-        print(f"--- File Error: {e}")
-    return (1, 1)
-
-
-def spi_fuzz(cs, clk, mosi, miso):
-    """
-    Fuzz SPI commands to discover valid ones.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending spi fuzz command")
-    request_args = [1000000, cs, clk, mosi, miso]
-    bs.NewTimeout(60)
-    rv = bs.requestreply(35, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-
-    n = bs_reply_length // (4 * 6)
-    print("+++ FOUND %d SPI commands" % (n))
-    for i in range(n):
-        cmd = bs_reply_args[i * 6 + 0]
-        v1 = bs_reply_args[i * 6 + 1]
-        v2 = bs_reply_args[i * 6 + 2]
-        v3 = bs_reply_args[i * 6 + 3]
-        v4 = bs_reply_args[i * 6 + 4]
-        v5 = bs_reply_args[i * 6 + 5]
-        print("+++ SPI command FOUND")
-        print("+++ SPI command %.2x" % (cmd))
-        print("+++ SPI v1 %.2x" % (v1))
-        print("+++ SPI v2 %.2x" % (v2))
-        print("+++ SPI v3 %.2x" % (v3))
-        print("+++ SPI v4 %.2x" % (v4))
-        print("+++ SPI v5 %.2x" % (v5))
-    print("+++ SPI Fuzz Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_discover_pinout():
-    """
-    Discover available SPI interfaces (pinouts) on the BUSSide device.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending spi discover pinout command")
-    request_args = [1000000]
-    bs.NewTimeout(60)
-    rv = bs.requestreply(29, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-
-    n = bs_reply_length // (4 * 4)
-    print("+++ FOUND %d SPI interfaces" % (n))
-    for i in range(n):
-        cs = bs_reply_args[i * 4 + 0]
-        clk = bs_reply_args[i * 4 + 1]
-        mosi = bs_reply_args[i * 4 + 2]
-        miso = bs_reply_args[i * 4 + 3]
-        print("+++ SPI interface FOUND")
-        print("+++ SPI CS at GPIO %i" % (cs))
-        print("+++ SPI CLK at GPIO %i" % (clk))
-        print("+++ SPI MOSI at GPIO %i" % (mosi))
-        print("+++ SPI MISO at GPIO %i" % (miso))
-    print("+++ SPI Discover Pinout Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_streg1(cs, clk, mosi, miso):
-    """
-    Read SPI status register 1.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI command")
-    request_args = [1000000, cs, clk, mosi, miso, 2, 0x05, 0x00]
-    rv = bs.requestreply(3, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    for i in range(1, 2):
-        print("+++ STATUS REGISTER 1: %.2x" % (bs_reply_args[i]))
-    print("+++ SPI Read Status Register 1 Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_streg2(cs, clk, mosi, miso):
-    """
-    Read SPI status register 2.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI command")
-    request_args = [1000000, cs, clk, mosi, miso, 2, 0x35, 0x00]
-    rv = bs.requestreply(3, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    for i in range(1, 2):
-        print("+++ STATUS REGISTER 2: %.2x" % (bs_reply_args[i]))
-    print("+++ SPI Read Status Register 2 Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_readuid(cs, clk, mosi, miso):
-    """
-    Read SPI unique ID.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Syncing with BUSSide before SPI read UID...")
-    bs.NewTimeout(30)  # Increase timeout for sync check
-    # Quick sync check with echo command
-    sync_result = bs.requestreply(0, [0x12345678])  # BS_ECHO with test data
-    if sync_result is None:
-        print("--- Sync failed - device not responsive")
-        return None
-    print("+++ Device synced successfully")
-    
-    print("+++ Sending SPI command")
-    request_args = [
-        1000000,
-        cs,
-        clk,
-        mosi,
-        miso,
-        13,
-        0x4B,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-        0,
-    ]
-    rv = bs.requestreply(3, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    for i in range(5, 13):
-        print("+++ UID: %.2x" % (bs_reply_args[i]))
-    print("+++ SPI Read UID Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def doSendCommand(cs, clk, mosi, miso, args):
-    """
-    Send a custom SPI command.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-        args (list): List of command arguments as strings.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI command")
-    n = len(args)
-    # Correctly initialize list with integers
-    request_args = [0] * (6 + n)
-    request_args[0] = 1000000
-    request_args[1] = cs
-    request_args[2] = clk
-    request_args[3] = mosi
-    request_args[4] = miso
-    request_args[5] = n
-    for i in range(n):
-        try:
-            # Handle hex (0x9F) or decimal
-            request_args[6 + i] = int(args[i], 0)
-        except ValueError:
-            print(f"--- Error: '{args[i]}' is not a valid number")
-            return None
-
-    rv = bs.requestreply(3, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    for i in range(min(n, len(bs_reply_args))):
-        print("+++ SPI Response: %.2x" % (bs_reply_args[i]))
-    print("+++ SPI Send Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_wp_enable(cs, clk, mosi, miso):
-    """
-    Enable SPI write protection.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI write protect commands")
-    request_args = [1000000, cs, clk, mosi, miso]
-    rv = bs.requestreply(41, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    print("+++ SPI Write Protect Command Enable Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_wp_disable(cs, clk, mosi, miso):
-    """
-    Disable SPI write protection.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI write protect commands")
-    request_args = [1000000, cs, clk, mosi, miso]
-    rv = bs.requestreply(39, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    print("+++ SPI Write Protect Disable Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_bb_read_id(cs, clk, mosi, miso):
-    """
-    Read SPI device ID using bit-banging.
-
-    Args:
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI read ID command")
-    request_args = [1000000, cs, clk, mosi, miso]
-    rv = bs.requestreply(31, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    v1 = bs_reply_args[0]
-    v2 = bs_reply_args[1]
-    v3 = bs_reply_args[2]
-    print("+++ SPI ID %.2x%.2x%.2x" % (v1, v2, v3))
-    print("+++ SPI Read ID Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def spi_erase_sector(skipsize, cs, clk, mosi, miso):
-    """
-    Erase a sector in SPI flash memory.
-
-    Args:
-        skipsize (int): Sector address to erase.
-        cs (int): Chip select GPIO pin.
-        clk (int): Clock GPIO pin.
-        mosi (int): MOSI GPIO pin.
-        miso (int): MISO GPIO pin.
-
-    Returns:
-        tuple: (reply_length, reply_args) or None if failed.
-    """
-    print("+++ Sending SPI erase sector command")
-    request_args = [1000000, skipsize, cs, clk, mosi, miso]
-    rv = bs.requestreply(27, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-    print("+++ SPI Erase Sector Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-
-def doFlashCommand(command):
-    """
-    Handle flash-related SPI commands.
-
-    Args:
-        command (str): The flash command string.
-
-    Returns:
-        int or None: 0 on success, None on invalid command.
-    """
-    if command.find("read id") == 0:
-        args = command[7:].split()
-        if len(args) == 0:
-            spi_read_id()
-        elif len(args) == 4:
-            a0 = int(args[0])
-            a1 = int(args[1])
-            a2 = int(args[2])
-            a3 = int(args[3])
-            spi_bb_read_id(a0, a1, a2, a3)
-            return 0
-        else:
-            return None
-    elif command.find("read sreg1") == 0:
-        args = command[10:].split()
-        if len(args) == 0:
-            spi_streg1(9, 6, 8, 7)
-            return 0
-        elif len(args) == 4:
-            a0 = int(args[0])
-            a1 = int(args[1])
-            a2 = int(args[2])
-            a3 = int(args[3])
-            spi_streg1(a0, a1, a2, a3)
-            return 0
-        else:
-            return None
-    elif command.find("read sreg2") == 0:
-        args = command[10:].split()
-        if len(args) == 0:
-            spi_streg2(9, 6, 8, 7)
-            return 0
-        elif len(args) == 4:
-            a0 = int(args[0])
-            a1 = int(args[1])
-            a2 = int(args[2])
-            a3 = int(args[3])
-            spi_streg2(a0, a1, a2, a3)
-            return 0
-        else:
-            return None
-    elif command.find("read uid") == 0:
-        args = command[8:].split()
-        if len(args) == 0:
-            spi_readuid(9, 6, 8, 7)
-        elif len(args) == 4:
-            a0 = int(args[0])
-            a1 = int(args[1])
-            a2 = int(args[2])
-            a3 = int(args[3])
-            spi_readuid(a0, a1, a2, a3)
-            return 0
-    elif command == "wp enable":
-        spi_wp_enable(9, 6, 8, 7)
-        return 0
-    elif command == "wp disable":
-        spi_wp_disable(9, 6, 8, 7)
-        return 0
-    elif command.find("write ") == 0:
-        args = command[5:].split()
-        if len(args) != 2:
-            return None
-        spi_flash(int(args[0]), args[1])
-        return 0
-    elif command.find("dump ") == 0:
-        args = command[5:].split()
-        if len(args) != 2:
-            return None
-        spi_dump_flash(int(args[0]), args[1])
-        return 0
-    elif command.find("erase sector ") == 0:
-        args = command[12:].split()
-        if len(args) == 1:
-            spi_erase_sector(int(args[0]), 9, 6, 8, 7)
-            return 0
-        else:
-            return None
-    else:
-        return None
-
-
-def doCommand(command):
-    """
-    Main command dispatcher for SPI operations.
-
-    Args:
-        command (str): The command string to execute.
-
-    Returns:
-        int or None: 0 on success, None on invalid command.
-    """
-    if command.find("flash ") == 0:
-        doFlashCommand(command[6:])
-        return 0
-    elif command.find("send default ") == 0:
-        args = command[12:].split()
-        if len(args) < 5:
-            return None
-        doSendCommand(9, 6, 8, 7, args)
-        return 0
-    elif command.find("send ") == 0:
-        args = command[4:].split()
-        if len(args) < 4:
-            return None
-        doSendCommand(int(args[0]), int(args[1]), int(args[2]), int(args[3]), args[4:])
-        return 0
-    elif command == "discover pinout":
-        spi_discover_pinout()
-        return 0
-    elif command.find("fuzz ") == 0:
-        args = command[4:].split()
-        if len(args) == 4:
-            spi_fuzz(int(args[0]), int(args[1]), int(args[2]), int(args[3]))
-            return 0
-        else:
-            return None
-    else:
-        return None
+#!/usr/bin/env python3
+
+"""
+BUSSide SPI Client Script
+
+This script provides functions to interact with SPI devices using the BUSSide hardware.
+It supports discovering SPI pinouts, reading/writing flash memory, fuzzing commands,
+and various SPI operations like reading IDs, status registers, and unique IDs.
+"""
+
+import bs
+import struct
+import os
+import io
+import sys
+
+# Block size for dumping data in bytes. Each block costs a full request
+# round trip, so larger blocks amortize the fixed framing overhead; the
+# firmware mallocs each reply from the ESP8266 heap, so 4 KiB is a safe
+# default. Override with BUSSIDE_BLOCKSIZE.
+BLOCKSIZE = int(os.environ.get("BUSSIDE_BLOCKSIZE", 4096))
+# Block size for writing data in bytes. Kept at the 256-byte NOR page
+# program size by default; override with BUSSIDE_WRITEBLOCKSIZE.
+WRITEBLOCKSIZE = int(os.environ.get("BUSSIDE_WRITEBLOCKSIZE", 256))
+
+# Default (cs, clk, mosi, miso) pinout used by the flash subcommands when
+# no pins are given on the command line.
+_DEFAULT_PINS = (9, 6, 8, 7)
+
+
+def _parse_pins(args):
+    """Parse four GPIO pin arguments into a (cs, clk, mosi, miso) tuple."""
+    return tuple(map(int, args))
+
+
+# SPI clock frequency (Hz) sent as the leading word of every SPI request.
+_SPI_FREQ = 1000000
+
+# Constant trailing words of the fixed send-command requests, built once
+# at import instead of re-listed on every call: byte count, opcode, and
+# the dummy/readback bytes.
+_STREG1_TAIL = (2, 0x05, 0x00)
+_STREG2_TAIL = (2, 0x35, 0x00)
+_READUID_TAIL = (13, 0x4B) + (0,) * 12
+
+
+def dumpSPI(size, skip):
+    """
+    Dump data from SPI device.
+
+    Args:
+        size (int): Size of data to dump in bytes.
+        skip (int): Offset to start dumping from.
+
+    Returns:
+        bytes: The dumped data, or None if failed.
+    """
+    request_args = [size, skip, _SPI_FREQ]
+    rv = bs.requestreply(1, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    # The reply words arrive as an array.array, so the raw bytes come out
+    # in one C-level copy with no per-word unpacking.
+    n = bs_reply_length // 4
+    return bs_reply_args[:n].tobytes()
+
+
+def spi_dump_flash(dumpsize, outfile):
+    """
+    Dump SPI flash memory to a file.
+
+    Args:
+        dumpsize (int): Total size to dump in bytes.
+        outfile (str): Output file path.
+
+    Returns:
+        tuple or None: (1, 1) on success, None on failure.
+    """
+    bs.NewTimeout(5)
+    skip = 0
+    print("+++ Dumping SPI")
+    # Precompute the per-block request arguments and stream them through
+    # the pipelined path so several blocks are in flight at once instead
+    # of a strict request/wait ping-pong per block.
+    blocks = []
+    while dumpsize > 0:
+        size = min(dumpsize, BLOCKSIZE)
+        blocks.append([size, skip, _SPI_FREQ])
+        skip += size
+        dumpsize -= size
+    try:
+        # Large write buffer, no per-block flush: the with block flushes
+        # on close, so the success message still implies data on disk.
+        with open(outfile, "wb", buffering=1 << 20) as f:
+            for rv in bs.requestreply_pipelined(1, blocks):
+                if rv is None:
+                    print("--- Timeout during dump")
+                    return None
+                bs_reply_length, bs_reply_args = rv
+                n = bs_reply_length // 4
+                f.write(bs_reply_args[:n].tobytes())
+        print("+++ SPI Dump Command Successfully Completed\n")
+    except Exception as e:
+        print(f"--- File Error: {e}")
+    return (1, 1)
+
+
+def spi_read_id():
+    """
+    Read SPI device ID.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI read ID command")
+    request_args = [_SPI_FREQ]
+    rv = bs.requestreply(17, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    v1 = bs_reply_args[0]
+    v2 = bs_reply_args[1]
+    v3 = bs_reply_args[2]
+    print("+++ SPI ID %.2x%.2x%.2x" % (v1, v2, v3))
+    print("+++ SPI Read ID Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def writeSPI(size, skipsize, data):
+    """
+    Write data to SPI device.
+
+    Args:
+        size (int): Size of data to write in bytes.
+        skipsize (int): Offset to start writing at.
+        data (list): List of uint32 words to write.
+
+    Returns:
+        tuple: Reply from the BUSSide device.
+    """
+    # One C-level list build instead of preallocating and assigning each
+    # element in a Python loop.
+    request_args = [size, skipsize, _SPI_FREQ, *data[: size // 4]]
+    rv = bs.requestreply(37, request_args)
+    return rv
+
+
+def writeSPI_nowait(size, skipsize, data):
+    """
+    Fire-and-forget variant of writeSPI: submit the page write and return
+    without waiting for the ack, so the next write can be prepared while
+    the flash is still programming (~1.5 ms per 256-byte page).
+
+    The firmware still sends its ack; the caller must drain the port
+    (bs.FlushInput()) before the next synchronous request, or use the
+    pipelined path which consumes acks in order.
+
+    Args:
+        size (int): Size of data to write in bytes.
+        skipsize (int): Offset to start writing at.
+        data (list): List of uint32 words to write.
+
+    Returns:
+        int or None: The request's sequence number, or None if the port
+        could not be opened.
+    """
+    request_args = [size, skipsize, _SPI_FREQ, *data[: size // 4]]
+    return bs.send_request_only(37, request_args)
+
+
+def spi_flash(dumpsize, infile, verify=False):
+    """
+    Write data from a file to SPI flash memory.
+
+    Args:
+        dumpsize (int): Total size to write in bytes.
+        infile (str): Input file path.
+        verify (bool): Read back and compare each block after its write
+            ack, aborting on the first mismatch instead of discovering a
+            bad image after the full write.
+
+    Returns:
+        tuple or None: (1, 1) on success, None on failure.
+    """
+    bs.NewTimeout(5)
+    skip = 0
+    print("+++ Writing SPI")
+    try:
+        # Read and unpack all write blocks up front, then pipeline them
+        # two-deep so the next page is on the wire while the flash is
+        # still programming the previous one.
+        blocks = []
+        # Pure sequential reads: `skip` always equals the current file
+        # position, and dropping the per-block seek keeps the buffered
+        # reader's readahead intact.
+        with open(infile, "rb", buffering=io.DEFAULT_BUFFER_SIZE * 8) as f:
+            while dumpsize > 0:
+                size = min(dumpsize, WRITEBLOCKSIZE)
+                rawdata = f.read(size)
+
+                # Unpack whole 4-byte chunks as little-endian uint32s in
+                # one bulk call instead of shifting bytes together per word
+                num_chunks = size // 4
+                data = list(
+                    struct.unpack("<%dI" % num_chunks, rawdata[: num_chunks * 4])
+                )
+
+                blocks.append([size, skip, _SPI_FREQ] + data)
+                skip += size
+                dumpsize -= size
+        if verify:
+            # The write ack only arrives once the page has programmed, so
+            # a read-back straight after it sees the final cell contents.
+            # Verifying per block bounds the rework to one block and
+            # aborts early instead of discovering a bad image at the end.
+            for size, blockskip, _freq, *data in blocks:
+                if bs.requestreply(37, [size, blockskip, _SPI_FREQ, *data]) is None:
+                    print("--- Timeout during write")
+                    return None
+                expected = struct.pack("<%dI" % len(data), *data)
+                readback = dumpSPI(size, blockskip)
+                if readback is None:
+                    print("--- Timeout during verify")
+                    return None
+                if bytes(readback[: len(expected)]) != expected:
+                    print("--- Verify FAILED at offset %d" % (blockskip))
+                    return None
+        else:
+            for rv in bs.requestreply_pipelined(37, blocks, window=2):
+                if rv is None:
+                    print("--- Timeout during write")
+                    return None
+        print("+++ SPI Flash Command Successfully Completed\n")
+    except Exception as e:
+        print(f"--- File Error: {e}")
+    return (1, 1)
+
+
+def spi_fuzz(cs, clk, mosi, miso):
+    """
+    Fuzz SPI commands to discover valid ones.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending spi fuzz command")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso]
+    bs.NewTimeout(60)
+    rv = bs.requestreply(35, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+
+    n = bs_reply_length // (4 * 6)
+    # Accumulate the result lines and emit them with one write: a fuzz
+    # run can report hundreds of commands, and per-line print calls on a
+    # line-buffered tty dominate at that volume.
+    lines = ["+++ FOUND %d SPI commands" % (n)]
+    for i in range(n):
+        # one slice + unpack instead of six subscript operations
+        cmd, v1, v2, v3, v4, v5 = bs_reply_args[i * 6 : i * 6 + 6]
+        lines.append("+++ SPI command FOUND")
+        lines.append("+++ SPI command %.2x" % (cmd))
+        lines.append("+++ SPI v1 %.2x" % (v1))
+        lines.append("+++ SPI v2 %.2x" % (v2))
+        lines.append("+++ SPI v3 %.2x" % (v3))
+        lines.append("+++ SPI v4 %.2x" % (v4))
+        lines.append("+++ SPI v5 %.2x" % (v5))
+    lines.append("+++ SPI Fuzz Command Successfully Completed\n")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_discover_pinout():
+    """
+    Discover available SPI interfaces (pinouts) on the BUSSide device.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending spi discover pinout command")
+    request_args = [_SPI_FREQ]
+    bs.NewTimeout(60)
+    rv = bs.requestreply(29, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+
+    n = bs_reply_length // (4 * 4)
+    lines = ["+++ FOUND %d SPI interfaces" % (n)]
+    for i in range(n):
+        cs, clk, mosi, miso = bs_reply_args[i * 4 : i * 4 + 4]
+        lines.append("+++ SPI interface FOUND")
+        lines.append("+++ SPI CS at GPIO %i" % (cs))
+        lines.append("+++ SPI CLK at GPIO %i" % (clk))
+        lines.append("+++ SPI MOSI at GPIO %i" % (mosi))
+        lines.append("+++ SPI MISO at GPIO %i" % (miso))
+    lines.append("+++ SPI Discover Pinout Command Successfully Completed\n")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_streg1(cs=9, clk=6, mosi=8, miso=7):
+    """
+    Read SPI status register 1.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI command")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso, *_STREG1_TAIL]
+    rv = bs.requestreply(3, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    for i in range(1, 2):
+        print("+++ STATUS REGISTER 1: %.2x" % (bs_reply_args[i]))
+    print("+++ SPI Read Status Register 1 Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_streg2(cs=9, clk=6, mosi=8, miso=7):
+    """
+    Read SPI status register 2.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI command")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso, *_STREG2_TAIL]
+    rv = bs.requestreply(3, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    for i in range(1, 2):
+        print("+++ STATUS REGISTER 2: %.2x" % (bs_reply_args[i]))
+    print("+++ SPI Read Status Register 2 Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_readuid(cs=9, clk=6, mosi=8, miso=7):
+    """
+    Read SPI unique ID.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    # No echo-sync preamble here: the shell already handshakes at connect
+    # time, and an extra round trip per call doubles single-shot latency.
+    print("+++ Sending SPI command")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso, *_READUID_TAIL]
+    rv = bs.requestreply(3, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    for i in range(5, 13):
+        print("+++ UID: %.2x" % (bs_reply_args[i]))
+    print("+++ SPI Read UID Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def doSendCommand(cs, clk, mosi, miso, args):
+    """
+    Send a custom SPI command.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+        args (list): List of command arguments as strings.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI command")
+    n = len(args)
+    # Correctly initialize list with integers
+    request_args = [0] * (6 + n)
+    request_args[0] = _SPI_FREQ
+    request_args[1] = cs
+    request_args[2] = clk
+    request_args[3] = mosi
+    request_args[4] = miso
+    request_args[5] = n
+    for i in range(n):
+        try:
+            # Handle hex (0x9F) or decimal
+            request_args[6 + i] = int(args[i], 0)
+        except ValueError:
+            print(f"--- Error: '{args[i]}' is not a valid number")
+            return None
+
+    rv = bs.requestreply(3, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    for i in range(min(n, len(bs_reply_args))):
+        print("+++ SPI Response: %.2x" % (bs_reply_args[i]))
+    print("+++ SPI Send Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_wp_enable(cs=9, clk=6, mosi=8, miso=7):
+    """
+    Enable SPI write protection.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI write protect commands")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso]
+    rv = bs.requestreply(41, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    print("+++ SPI Write Protect Command Enable Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_wp_disable(cs=9, clk=6, mosi=8, miso=7):
+    """
+    Disable SPI write protection.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI write protect commands")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso]
+    rv = bs.requestreply(39, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    print("+++ SPI Write Protect Disable Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_bb_read_id(cs, clk, mosi, miso):
+    """
+    Read SPI device ID using bit-banging.
+
+    Args:
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI read ID command")
+    request_args = [_SPI_FREQ, cs, clk, mosi, miso]
+    rv = bs.requestreply(31, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    v1 = bs_reply_args[0]
+    v2 = bs_reply_args[1]
+    v3 = bs_reply_args[2]
+    print("+++ SPI ID %.2x%.2x%.2x" % (v1, v2, v3))
+    print("+++ SPI Read ID Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+def spi_erase_sector(skipsize, cs=9, clk=6, mosi=8, miso=7):
+    """
+    Erase a sector in SPI flash memory.
+
+    Args:
+        skipsize (int): Sector address to erase.
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple: (reply_length, reply_args) or None if failed.
+    """
+    print("+++ Sending SPI erase sector command")
+    request_args = [_SPI_FREQ, skipsize, cs, clk, mosi, miso]
+    rv = bs.requestreply(27, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+    print("+++ SPI Erase Sector Command Successfully Completed\n")
+    return (bs_reply_length, bs_reply_args)
+
+
+SECTORSIZE = 4096  # Erase granularity of common NOR flash
+
+
+def spi_erase_range(start, nsectors, cs=9, clk=6, mosi=8, miso=7):
+    """
+    Erase a contiguous run of 4 KiB sectors in SPI flash memory.
+
+    The firmware only understands single-sector erase (command 27), so
+    the per-sector requests are pipelined back-to-back instead of paying
+    a full round trip per sector.
+
+    Args:
+        start (int): Byte address of the first sector to erase.
+        nsectors (int): Number of consecutive sectors to erase.
+        cs (int): Chip select GPIO pin.
+        clk (int): Clock GPIO pin.
+        mosi (int): MOSI GPIO pin.
+        miso (int): MISO GPIO pin.
+
+    Returns:
+        tuple or None: (1, 1) on success, None on failure.
+    """
+    print("+++ Sending SPI erase range command")
+    blocks = [
+        [_SPI_FREQ, start + i * SECTORSIZE, cs, clk, mosi, miso] for i in range(nsectors)
+    ]
+    for rv in bs.requestreply_pipelined(27, blocks):
+        if rv is None:
+            print("--- Timeout during erase")
+            return None
+    print("+++ SPI Erase Range Command Successfully Completed\n")
+    return (1, 1)
+
+
+def doFlashCommand(command):
+    """
+    Handle flash-related SPI commands.
+
+    Args:
+        command (str): The flash command string.
+
+    Returns:
+        int or None: 0 on success, None on invalid command.
+    """
+    if command.startswith("read id"):
+        args = command[7:].split()
+        if len(args) == 0:
+            spi_read_id()
+        elif len(args) == 4:
+            spi_bb_read_id(*_parse_pins(args))
+            return 0
+        else:
+            return None
+    elif command.startswith("read sreg1"):
+        args = command[10:].split()
+        if len(args) == 0:
+            spi_streg1()
+            return 0
+        elif len(args) == 4:
+            spi_streg1(*_parse_pins(args))
+            return 0
+        else:
+            return None
+    elif command.startswith("read sreg2"):
+        args = command[10:].split()
+        if len(args) == 0:
+            spi_streg2()
+            return 0
+        elif len(args) == 4:
+            spi_streg2(*_parse_pins(args))
+            return 0
+        else:
+            return None
+    elif command.startswith("read uid"):
+        args = command[8:].split()
+        if len(args) == 0:
+            spi_readuid()
+        elif len(args) == 4:
+            spi_readuid(*_parse_pins(args))
+            return 0
+    elif command == "wp enable":
+        spi_wp_enable()
+        return 0
+    elif command == "wp disable":
+        spi_wp_disable()
+        return 0
+    elif command.startswith("write verify "):
+        args = command[13:].split()
+        if len(args) != 2:
+            return None
+        spi_flash(int(args[0]), args[1], verify=True)
+        return 0
+    elif command.startswith("write "):
+        args = command[5:].split()
+        if len(args) != 2:
+            return None
+        spi_flash(int(args[0]), args[1])
+        return 0
+    elif command.startswith("dump "):
+        args = command[5:].split()
+        if len(args) != 2:
+            return None
+        spi_dump_flash(int(args[0]), args[1])
+        return 0
+    elif command.startswith("erase sector "):
+        args = command[12:].split()
+        if len(args) == 1:
+            spi_erase_sector(int(args[0]))
+            return 0
+        else:
+            return None
+    elif command.startswith("erase range "):
+        args = command[12:].split()
+        if len(args) == 2:
+            spi_erase_range(int(args[0]), int(args[1]))
+            return 0
+        else:
+            return None
+    else:
+        return None
+
+
+def doCommand(command):
+    """
+    Main command dispatcher for SPI operations.
+
+    Args:
+        command (str): The command string to execute.
+
+    Returns:
+        int or None: 0 on success, None on invalid command.
+    """
+    if command.startswith("flash "):
+        doFlashCommand(command[6:])
+        return 0
+    elif command.startswith("send default "):
+        args = command[12:].split()
+        if len(args) < 5:
+            return None
+        doSendCommand(*_DEFAULT_PINS, args)
+        return 0
+    elif command.startswith("send "):
+        args = command[4:].split()
+        if len(args) < 4:
+            return None
+        doSendCommand(*_parse_pins(args[:4]), args[4:])
+        return 0
+    elif command == "discover pinout":
+        spi_discover_pinout()
+        return 0
+    elif command.startswith("fuzz "):
+        args = command[4:].split()
+        if len(args) == 4:
+            spi_fuzz(*_parse_pins(args))
+            return 0
+        else:
+            return None
+    else:
+        return None
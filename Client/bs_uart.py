@@ -1,336 +1,458 @@
-#!/usr/bin/env python3
-
-"""Minimal UART helpers for BUSSide client.
-
-This file contains small utility functions that call into the low-level
-`bs` framing API to discover UART signals and to provide a passthrough
-terminal mode.
-"""
-
-import bs
-import time
-import sys
-import struct
-
-def uart_data_discover():
-    """Request the device to sample GPIO activity and report change counts.
-
-    Returns `(length, args)` on success or `None` on failure.
-    """
-    print("+++ Sending UART data discovery command")
-    request_args = []
-    bs.NewTimeout(60)
-    rv = bs.requestreply(15, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-
-    ngpio = 9
-    for i in range(ngpio):
-        #print("+++ SIGNAL CHANGES: D%d --> %d" % ((i + 1), bs_reply_args[i]))
-        if bs_reply_args[i] != 0:
-            print("+++-----------------------------------------------+++")
-            print("+++ SIGNAL CHANGES: D%d --> %d" % ((i + 1), bs_reply_args[i]))
-            print("+++-----------------------------------------------+++")
-        else:
-            print("+++ GPIO %d: No signal changes detected" % (i + 1))
-    
-    print("+++ Note: GPIO 1 may show activity but can't be used for UART.")
-    print("+++")        
-    print("+++ UART Data Discover Command Successfully Completed\n")
-    return rv
-
-
-def uart_tx(rxpin, baudrate):
-    print("+++ Sending UART discovery tx command")
-    request_args = [rxpin, baudrate]
-    bs.NewTimeout(3)
-    rv = bs.requestreply(21, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-
-    txpin = bs_reply_args[0]
-    if txpin != 0xFFFFFFFF:
-        print("+++ FOUND UART TX on GPIO %d" % (txpin + 1))
-    else:
-        print("+++ NOT FOUND. Note that GPIO 1 can't be used.")
-    print("+++ UART Discovery TX Command Successfully Completed\n")
-    return rv
-
-def uart_rx():
-    print("+++ Sending UART discovery rx command")
-    request_args = []
-    bs.NewTimeout(120)
-    rv = bs.requestreply(11, request_args)
-    if rv is None:
-        return None
-    bs_reply_length, bs_reply_args = rv
-
-    ngpio = 9
-    # Safety check: ensure we have enough data for all GPIOs
-    # Each GPIO needs 5 slots. Total needed = 45.
-    expected_len = ngpio * 5
-
-    for i in range(ngpio):
-        base = 5 * i
-        # Verify the base index exists in the returned data
-        if len(bs_reply_args) > base:
-            changes = bs_reply_args[base + 0]
-            print("+++ GPIO %d has %d signal changes" % (i + 1, changes))
-            
-            if changes > 0 and len(bs_reply_args) >= (base + 5):
-                databits = bs_reply_args[base + 1]
-                if databits > 0:
-                    stopbits = bs_reply_args[base + 2]
-                    parity = bs_reply_args[base + 3]
-                    baudrate = bs_reply_args[base + 4]
-                    
-                    print("+++ UART FOUND")
-                    print("+++ BAUDRATE: %d" % (baudrate))
-                    print("+++ DATABITS: %d" % (databits))
-                    
-                    if parity == 0:
-                        print("+++ PARITY: EVEN")
-                    elif parity == 1:
-                        print("+++ PARITY: ODD")
-                    else:
-                        print("+++ PARITY: NONE")
-                    print("+++ STOPBITS: %d" % (stopbits))
-        else:
-            print("--- GPIO %d: No data received from hardware" % (i + 1))
-    print("+++ UART Discovery RX Command Successfully Completed\n")
-    return (bs_reply_length, bs_reply_args)
-
-def uart_get_status():
-    """Queries the hardware for the current persistent UART settings."""
-    print("+++ Querying Hardware UART Status...")
-    bs.NewTimeout(2)
-    # Command 48: BS_UART_GET_CONFIG
-    rv = bs.requestreply(48, [])
-    
-    if rv is None:
-        print("--- Error: No response from hardware.")
-        return None
-
-    _, args = rv
-    if len(args) < 3:
-        print("--- Error: Malformed status response.")
-        return None
-
-    dbits = args[0]
-    sbits = args[1]
-    p_val = args[2]
-
-    # Map the integer back to a string for the user
-    # Note: C++ uses -1 (represented as 4294967295 in unsigned 32-bit) for None
-    p_name = "NONE"
-    if p_val == 0: p_name = "EVEN"
-    elif p_val == 1: p_name = "ODD"
-    elif p_val > 2: p_name = "NONE" # Catch-all for -1 unsigned wrap
-
-    print("+++-----------------------------------+++")
-    print(f"+++ CURRENT HW CONFIG: {dbits}{p_name[0]}{sbits}")
-    print(f"+++ Data Bits: {dbits}")
-    print(f"+++ Stop Bits: {sbits}")
-    print(f"+++ Parity:    {p_name}")
-    print("+++-----------------------------------+++")
-    return True
-
-def uart_config(dbits, parity_char, sbits):
-    """Sets the global UART parameters on the BUSSide hardware."""
-    try:
-        # Convert parity character to the numeric index the C++ code expects
-        # -1: None (0), 0: Even (1), 1: Odd (2)
-        p_map = {"n": 0, "e": 1, "o": 2}
-        p_val = p_map.get(str(parity_char).lower(), 0)
-        
-        # Pack into mask: [Parity(bits 8-11)][Stop(bits 4-7)][Data(bits 0-3)]
-        mask = (int(dbits) & 0x0F)
-        mask |= (int(sbits) & 0x0F) << 4
-        mask |= (p_val & 0x0F) << 8
-        
-        print(f"+++ Sending Config (ID 47) | Mask: {hex(mask)} ({dbits}{parity_char.upper()}{sbits})")
-        
-        bs.NewTimeout(2)
-        # Use 47 to match #define BS_UART_SET_CONFIG 47 in busside.h
-        return bs.requestreply(47, [mask])
-    except Exception as e:
-        print(f"--- UART Config Error: {e}")
-        return None
-    
-def uart_passthrough(gpiorx, gpiotx, baudrate):
-    # Convert indices (1-based to 0-based)
-    rx_idx = int(gpiorx) - 1
-    tx_idx = int(gpiotx) - 1
-    if tx_idx < 0 or tx_idx > 250: tx_idx = 255
-    
-    # Use bs serial port directly.
-    ser = bs.getSerial()
-    
-    print(f"+++ Forcing Bridge Entry: RX={gpiorx}, TX={gpiotx}, @{baudrate}")
-    
-    # Internal request-reply but force it to stop after one try
-    # by setting a very short timeout and catching the error.
-    bs.NewTimeout(1)
-    try:
-        bs.requestreply(19, [rx_idx, tx_idx, int(baudrate)])
-    except:
-        pass # Ignore the timeout/sync error
-    
-    # Breathe and stabilize
-    time.sleep(0.5)
-    ser.reset_input_buffer()
-    
-    # Terminal Loop
-    bs.keys_init()
-    print("+++ Terminal Started (Press CTRL+X then Ctrl+C to exit)")
-    try:
-        while True:
-            if ser.in_waiting > 0:
-                raw = ser.read(ser.in_waiting)
-                sys.stdout.write(raw.decode("latin-1", errors="replace"))
-                sys.stdout.flush()
-                # Add a small buffer to check for the exit string
-                line_buffer = ""
-                for char in raw.decode("latin-1", errors="replace"):
-                    line_buffer += char
-                    if "BUSSIDE_EXIT_UART_PASSTHROUGH" in line_buffer:
-                        print("\n[!] Device signaled exit. Returning to BUSSide...")
-                        return
-
-            char = bs.keys_getchar()
-            if char is not None:
-                ser.write(char.encode("utf-8"))
-            
-            time.sleep(0.01)
-    except KeyboardInterrupt:
-        print("\n+++ Terminating...")
-    finally:
-        bs.keys_cleanup()
-        ser.write(b'\xfe\xca')
-
-def terminal_loop_robust(ser):
-    bs.keys_init()
-    print("--- TERMINAL ACTIVE ---")
-    try:
-        while True:
-            if ser.in_waiting > 0:
-                data = ser.read(ser.in_waiting)
-                # Try decoding with 'latin-1'—it never fails/crashes like utf-8
-                sys.stdout.write(data.decode("latin-1", errors="replace"))
-                sys.stdout.flush()
-            
-            char = bs.keys_getchar()
-            if char is not None:
-                ser.write(char.encode("utf-8"))
-            time.sleep(0.01)
-    except KeyboardInterrupt:
-        print("\n+++ Exiting...")
-    finally:
-        bs.keys_cleanup()
-        ser.write(b'\xfe\xca')
-
-def uart_passthrough_auto():
-    txpin = 0xFFFFFFFF
-    # 1. Discover active RX lines
-    rv = uart_rx()
-    print("+++ Starting UART Auto-Discovery")
-    
-    if rv is None:
-        print("+++ NOT FOUND")
-        return 0
-        
-    bs_reply_length, bs_reply_args = rv
-    found_candidates = []
-    ngpio = 9
-    
-    # 2. Identify candidate pins (using 0-based indices)
-    for i in range(ngpio):
-        changes = bs_reply_args[5 * i + 0]
-        if changes > 50: # Threshold to ignore noise
-            baudrate = bs_reply_args[5 * i + 4]
-            # Use raw index 'i' (do NOT add 1)
-            found_candidates.append({'rx': i, 'baud': baudrate})
-            
-    if not found_candidates:
-        print("+++ NO ACTIVE UART SIGNALS DETECTED")
-        return 0
-        
-    if len(found_candidates) > 1:
-        print(f"+++ Found {len(found_candidates)} active lines. Picking the first one...")
-    
-    # Select our best candidate
-    target = found_candidates[0]
-    rxpin = target['rx']
-    baudrate = target['baud']
-    
-    print(f"+++ Detected RX on Index {rxpin} at {baudrate} baud.")
-    print("+++ Waiting for line to idle before TX discovery...")
-    time.sleep(5)
-
-    # 3. Attempt to find the TX pin (the pin we talk TO)
-    for j in range(3):
-        rv = uart_tx(rxpin, baudrate)
-        if rv is not None:
-            tx_reply_args = rv
-            detected_tx = tx_reply_args[0]
-            if detected_tx != 0xFFFFFFFF:
-                txpin = detected_tx # Use raw index
-                print(f"+++ Found corresponding TX on Index {txpin}")
-                break
-        print(f"+++ TX Detection attempt {j+1} failed. Retrying...")
-        time.sleep(2)
-
-    if txpin == rxpin or txpin == 0xFFFFFFFF:
-        print(f"+++ TX pin ({txpin}) is invalid or matches RX ({rxpin}).")
-        print("+++ Defaulting to Sniff-Only mode (TX disabled).")
-        txpin = 255 # Standard 'No Pin' value for the firmware
-        
-    # 4. Trigger Passthrough
-    return uart_passthrough(rxpin, txpin, baudrate)
-
-def doCommand(command):
-    if command == "discover rx":
-        uart_rx()
-        return 0
-    elif command == "discover data":
-        uart_data_discover()
-        return 0
-    elif command.find("discover tx ") == 0:
-        args = command[12:].split()
-        if len(args) != 2:
-            return None
-        uart_tx(int(args[0]), int(args[1]))
-        return 0
-    elif command == "passthrough auto":
-        uart_passthrough_auto()
-        return 0
-    elif command.startswith("passthrough "):
-        args = command.split()
-        if len(args) != 4: # passthrough RX TX BAUD DATABITS STOPBITS PARITY
-            print("Usage: passthrough <rx_pin> <tx_pin> <baud> <databits> <stopbits> <parity>")
-            return 0
-        uart_passthrough(int(args[1]), int(args[2]), int(args[3]))
-        #uart_passthrough_refined(args[1], args[2], args[3])
-        #uart_passthrough_refined(args[1], args[2], args[3], args[4], args[5], args[6])
-        return 0
-    
-    elif command.startswith("config "):
-        # Expected input: BUSSide> uart config 8 n 1
-        args = command.split() # ['config', '8', 'n', '1']
-        if len(args) != 4:
-            print("Usage: uart config <databits> <parity> <stopbits>")
-            print("Example: uart config 8 n 1")
-            return 0
-        
-        # Pass the arguments directly to our updated function
-        uart_config(args[1], args[2], args[3])
-        return 0
-    
-    elif command == "status":
-        uart_get_status()
-        return 0
-    
-    else:
-        return None
+#!/usr/bin/env python3
+
+"""Minimal UART helpers for BUSSide client.
+
+This file contains small utility functions that call into the low-level
+`bs` framing API to discover UART signals and to provide a passthrough
+terminal mode.
+"""
+
+import bs
+import time
+import sys
+import os
+import select
+
+# Byte string the firmware prints to signal the end of passthrough mode.
+SENTINEL = b"BUSSIDE_EXIT_UART_PASSTHROUGH"
+
+# Precomputed (empty) payload for the no-argument discovery/status RPCs;
+# passing request_bytes lets requestreply skip its per-call struct.pack.
+_NO_ARGS = b""
+
+def uart_data_discover():
+    """Request the device to sample GPIO activity and report change counts.
+
+    Returns `(length, args)` on success or `None` on failure.
+    """
+    print("+++ Sending UART data discovery command")
+    request_args = []
+    bs.NewTimeout(60)
+    rv = bs.requestreply(15, request_args, request_bytes=_NO_ARGS)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+
+    ngpio = 9
+    # Accumulate the report and emit it with one write instead of a
+    # print (and a flush on a line-buffered tty) per GPIO line.
+    lines = []
+    for i in range(ngpio):
+        if bs_reply_args[i] != 0:
+            lines.append("+++-----------------------------------------------+++")
+            lines.append("+++ SIGNAL CHANGES: D%d --> %d" % ((i + 1), bs_reply_args[i]))
+            lines.append("+++-----------------------------------------------+++")
+        else:
+            lines.append("+++ GPIO %d: No signal changes detected" % (i + 1))
+
+    lines.append("+++ Note: GPIO 1 may show activity but can't be used for UART.")
+    lines.append("+++")
+    lines.append("+++ UART Data Discover Command Successfully Completed\n")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return rv
+
+
+def uart_tx(rxpin, baudrate):
+    print("+++ Sending UART discovery tx command")
+    request_args = [rxpin, baudrate]
+    bs.NewTimeout(3)
+    rv = bs.requestreply(21, request_args)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+
+    txpin = bs_reply_args[0]
+    if txpin != 0xFFFFFFFF:
+        print("+++ FOUND UART TX on GPIO %d" % (txpin + 1))
+    else:
+        print("+++ NOT FOUND. Note that GPIO 1 can't be used.")
+    print("+++ UART Discovery TX Command Successfully Completed\n")
+    return rv
+
+def uart_rx():
+    print("+++ Sending UART discovery rx command")
+    request_args = []
+    bs.NewTimeout(120)
+    rv = bs.requestreply(11, request_args, request_bytes=_NO_ARGS)
+    if rv is None:
+        return None
+    bs_reply_length, bs_reply_args = rv
+
+    ngpio = 9
+    # The reply is a fixed 9x5 record layout: (changes, databits,
+    # stopbits, parity, baudrate) per GPIO. Slice each record out once
+    # instead of recomputing 5*i+k indexing per field, and batch the
+    # whole report into a single stdout write.
+    lines = []
+    for i in range(ngpio):
+        base = 5 * i
+        # Verify the base index exists in the returned data
+        if len(bs_reply_args) > base:
+            record = bs_reply_args[base : base + 5]
+            changes = record[0]
+            lines.append("+++ GPIO %d has %d signal changes" % (i + 1, changes))
+
+            if changes > 0 and len(record) == 5:
+                _, databits, stopbits, parity, baudrate = record
+                if databits > 0:
+                    lines.append("+++ UART FOUND")
+                    lines.append("+++ BAUDRATE: %d" % (baudrate))
+                    lines.append("+++ DATABITS: %d" % (databits))
+
+                    if parity == 0:
+                        lines.append("+++ PARITY: EVEN")
+                    elif parity == 1:
+                        lines.append("+++ PARITY: ODD")
+                    else:
+                        lines.append("+++ PARITY: NONE")
+                    lines.append("+++ STOPBITS: %d" % (stopbits))
+        else:
+            lines.append("--- GPIO %d: No data received from hardware" % (i + 1))
+    lines.append("+++ UART Discovery RX Command Successfully Completed\n")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return (bs_reply_length, bs_reply_args)
+
+def uart_get_status():
+    """Queries the hardware for the current persistent UART settings."""
+    print("+++ Querying Hardware UART Status...")
+    bs.NewTimeout(2)
+    # Command 48: BS_UART_GET_CONFIG
+    rv = bs.requestreply(48, [], request_bytes=_NO_ARGS)
+    
+    if rv is None:
+        print("--- Error: No response from hardware.")
+        return None
+
+    _, args = rv
+    if len(args) < 3:
+        print("--- Error: Malformed status response.")
+        return None
+
+    dbits = args[0]
+    sbits = args[1]
+    p_val = args[2]
+
+    # Map the integer back to a string for the user
+    # Note: C++ uses -1 (represented as 4294967295 in unsigned 32-bit) for None
+    p_name = "NONE"
+    if p_val == 0: p_name = "EVEN"
+    elif p_val == 1: p_name = "ODD"
+    elif p_val > 2: p_name = "NONE" # Catch-all for -1 unsigned wrap
+
+    print("+++-----------------------------------+++")
+    print(f"+++ CURRENT HW CONFIG: {dbits}{p_name[0]}{sbits}")
+    print(f"+++ Data Bits: {dbits}")
+    print(f"+++ Stop Bits: {sbits}")
+    print(f"+++ Parity:    {p_name}")
+    print("+++-----------------------------------+++")
+    return True
+
+def uart_config(dbits, parity_char, sbits):
+    """Sets the global UART parameters on the BUSSide hardware."""
+    try:
+        # Convert parity character to the numeric index the C++ code expects
+        # -1: None (0), 0: Even (1), 1: Odd (2)
+        p_map = {"n": 0, "e": 1, "o": 2}
+        p_val = p_map.get(str(parity_char).lower(), 0)
+        
+        # Pack into mask: [Parity(bits 8-11)][Stop(bits 4-7)][Data(bits 0-3)]
+        mask = (int(dbits) & 0x0F)
+        mask |= (int(sbits) & 0x0F) << 4
+        mask |= (p_val & 0x0F) << 8
+        
+        print(f"+++ Sending Config (ID 47) | Mask: {hex(mask)} ({dbits}{parity_char.upper()}{sbits})")
+        
+        bs.NewTimeout(2)
+        # Use 47 to match #define BS_UART_SET_CONFIG 47 in busside.h
+        return bs.requestreply(47, [mask])
+    except Exception as e:
+        print(f"--- UART Config Error: {e}")
+        return None
+    
+def _drain_quiet(ser, quiet_ms=50, max_ms=1000):
+    """Discard incoming bytes until the line has been silent for
+    `quiet_ms`, giving up after `max_ms`.
+
+    A quiet line finishes in one 50 ms select; a device still streaming
+    stale output keeps being drained, where the old reset + fixed sleep
+    let late arrivals corrupt the first screen of the terminal.
+    """
+    fd = ser.fileno()
+    deadline = time.monotonic() + max_ms / 1000.0
+    while time.monotonic() < deadline:
+        readable, _, _ = select.select([fd], [], [], quiet_ms / 1000.0)
+        if not readable:
+            return
+        os.read(fd, 4096)
+
+
+def uart_passthrough(gpiorx, gpiotx, baudrate):
+    # Convert indices (1-based to 0-based)
+    rx_idx = int(gpiorx) - 1
+    tx_idx = int(gpiotx) - 1
+    if tx_idx < 0 or tx_idx > 250: tx_idx = 255
+    
+    # Use bs serial port directly.
+    ser = bs.getSerial()
+    
+    print(f"+++ Forcing Bridge Entry: RX={gpiorx}, TX={gpiotx}, @{baudrate}")
+    
+    # The firmware acks this request (sync marker plus a
+    # BS_REPLY_UART_PASSTHROUGH header) and then drops straight into
+    # bridge mode. There is nothing in the ack worth parsing, and the
+    # full requestreply retry machinery burned its timeout here when the
+    # bridge output arrived on top of the reply, so send the frame and
+    # let the drain below discard the ack along with any stale output.
+    bs.send_request_only(19, [rx_idx, tx_idx, int(baudrate)])
+
+    # Swallow the ack and any stale output until the line goes quiet
+    _drain_quiet(ser)
+    
+    # Terminal Loop
+    bs.keys_init()
+    print("+++ Terminal Started (Press CTRL+X then Ctrl+C to exit)")
+    # Device output below bypasses the text layer via sys.stdout.buffer,
+    # so flush it now or the banner is withheld for the whole session.
+    sys.stdout.flush()
+    # Tail of the previous chunk, kept so a sentinel split across two
+    # serial reads is still spotted.
+    tail = b""
+    out = sys.stdout.buffer
+    last_flush = time.monotonic()
+    # Cache the raw descriptors once; reading with os.read skips the
+    # in_waiting TIOCINQ ioctl and the exact-size allocation that
+    # ser.read(ser.in_waiting) performs on every wakeup.
+    ser_fd = ser.fileno()
+    stdin_fd = sys.stdin.fileno()
+    try:
+        while True:
+            # Sleep in the kernel until the device or the keyboard has
+            # data instead of waking every 10 ms to poll both; this cuts
+            # idle CPU to zero and removes up to 10 ms of latency per
+            # byte in each direction.
+            readable, _, _ = select.select([ser_fd, stdin_fd], [], [], 1.0)
+            if not readable:
+                # idle: push out anything still buffered
+                out.flush()
+                last_flush = time.monotonic()
+            if ser_fd in readable:
+                raw = os.read(ser_fd, 4096)
+                # Raw bytes straight to the terminal; no latin-1 decode
+                # and stdout re-encode round trip per chunk. Flushing on
+                # newline or every 50 ms (instead of per chunk) batches
+                # the write syscalls on fast streams while keeping the
+                # display visibly live.
+                out.write(raw)
+                now = time.monotonic()
+                if b"\n" in raw or now - last_flush > 0.05:
+                    out.flush()
+                    last_flush = now
+                # One C-level scan per chunk for the exit string; the
+                # carried tail catches a sentinel straddling two reads.
+                hay = tail + raw
+                if hay.find(SENTINEL) != -1:
+                    out.flush()
+                    print("\n[!] Device signaled exit. Returning to BUSSide...")
+                    return
+                tail = hay[-(len(SENTINEL) - 1):]
+
+            if stdin_fd in readable:
+                # Drain every queued keystroke (pastes arrive in bursts)
+                # and send them in one write instead of one per byte.
+                keybuf = bytearray()
+                char = bs.keys_getchar()
+                while char is not None:
+                    keybuf += char
+                    char = bs.keys_getchar()
+                if keybuf:
+                    ser.write(bytes(keybuf))
+    except KeyboardInterrupt:
+        print("\n+++ Terminating...")
+    finally:
+        bs.keys_cleanup()
+        ser.write(b'\xfe\xca')
+
+def terminal_loop_robust(ser):
+    bs.keys_init()
+    print("--- TERMINAL ACTIVE ---")
+    # Same as uart_passthrough: make the banner visible before the loop
+    # starts writing through sys.stdout.buffer.
+    sys.stdout.flush()
+    ser_fd = ser.fileno()
+    stdin_fd = sys.stdin.fileno()
+    try:
+        while True:
+            # Same blocking select as uart_passthrough: no polling wakeups
+            readable, _, _ = select.select([ser_fd, stdin_fd], [], [], 1.0)
+            if ser_fd in readable:
+                data = os.read(ser_fd, 4096)
+                # Raw bytes straight to the terminal: latin-1 round-trips
+                # every byte anyway, so decoding only to re-encode at the
+                # stdout boundary was two wasted passes per chunk.
+                sys.stdout.buffer.write(data)
+                sys.stdout.flush()
+
+            if stdin_fd in readable:
+                # Drain every queued keystroke (pastes arrive in bursts)
+                # and send them in one write instead of one per byte.
+                keybuf = bytearray()
+                char = bs.keys_getchar()
+                while char is not None:
+                    keybuf += char
+                    char = bs.keys_getchar()
+                if keybuf:
+                    ser.write(bytes(keybuf))
+    except KeyboardInterrupt:
+        print("\n+++ Exiting...")
+    finally:
+        bs.keys_cleanup()
+        ser.write(b'\xfe\xca')
+
+def wait_for_idle(rxpin, max_wait=60, poll=2.0, threshold=3):
+    """Wait until the RX line goes quiet.
+
+    Each data-discovery call (command 15) zeroes the change counters and
+    samples a fresh window, so the count it returns for `rxpin` is the
+    line's activity over that window. Returns True as soon as one window
+    shows at most `threshold` changes, or False once `max_wait` seconds
+    elapse. A quiet line finishes after a single sampling window instead
+    of a fixed worst-case sleep.
+
+    Each poll doubles as a link probe: a device that stops answering
+    mid-wait is reported immediately by returning None rather than
+    silently burning the rest of the window.
+    """
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        bs.NewTimeout(60)
+        rv = bs.requestreply(15, [], request_bytes=_NO_ARGS)
+        if rv is None:
+            return None
+        _, args = rv
+        count = args[rxpin] if len(args) > rxpin else 0
+        if count <= threshold:
+            return True
+        time.sleep(poll)
+    return False
+
+
+def uart_passthrough_auto():
+    txpin = 0xFFFFFFFF
+    # 1. Discover active RX lines
+    rv = uart_rx()
+    print("+++ Starting UART Auto-Discovery")
+    
+    if rv is None:
+        print("+++ NOT FOUND")
+        return 0
+        
+    bs_reply_length, bs_reply_args = rv
+    ngpio = 9
+
+    # 2. Identify candidate pins in one pass over the 9x5 records: any
+    # GPIO whose change count clears the >50 noise threshold, keeping
+    # the raw 0-based index and the detected baudrate.
+    found_candidates = [
+        {'rx': i, 'baud': bs_reply_args[5 * i + 4]}
+        for i in range(ngpio)
+        if bs_reply_args[5 * i] > 50
+    ]
+            
+    if not found_candidates:
+        print("+++ NO ACTIVE UART SIGNALS DETECTED")
+        return 0
+        
+    if len(found_candidates) > 1:
+        print(f"+++ Found {len(found_candidates)} active lines. Picking the first one...")
+    
+    # Select our best candidate
+    target = found_candidates[0]
+    rxpin = target['rx']
+    baudrate = target['baud']
+    
+    print(f"+++ Detected RX on Index {rxpin} at {baudrate} baud.")
+    print("+++ Waiting for line to idle before TX discovery...")
+    if wait_for_idle(rxpin) is None:
+        print("--- Device stopped responding during idle wait")
+        return 0
+
+    # 3. Attempt to find the TX pin (the pin we talk TO)
+    for j in range(3):
+        rv = uart_tx(rxpin, baudrate)
+        if rv is not None:
+            tx_reply_args = rv
+            detected_tx = tx_reply_args[0]
+            if detected_tx != 0xFFFFFFFF:
+                txpin = detected_tx # Use raw index
+                print(f"+++ Found corresponding TX on Index {txpin}")
+                break
+        print(f"+++ TX Detection attempt {j+1} failed. Retrying...")
+        time.sleep(2)
+
+    if txpin == rxpin or txpin == 0xFFFFFFFF:
+        print(f"+++ TX pin ({txpin}) is invalid or matches RX ({rxpin}).")
+        print("+++ Defaulting to Sniff-Only mode (TX disabled).")
+        txpin = 255 # Standard 'No Pin' value for the firmware
+        
+    # 4. Trigger Passthrough
+    return uart_passthrough(rxpin, txpin, baudrate)
+
+def _cmd_discover(args):
+    if args == ["rx"]:
+        uart_rx()
+        return 0
+    if args == ["data"]:
+        uart_data_discover()
+        return 0
+    if len(args) == 3 and args[0] == "tx":
+        uart_tx(int(args[1]), int(args[2]))
+        return 0
+    return None
+
+
+def _cmd_passthrough(args):
+    if args == ["auto"]:
+        uart_passthrough_auto()
+        return 0
+    if len(args) != 3:
+        print("Usage: passthrough <rx_pin> <tx_pin> <baud>")
+        return 0
+    uart_passthrough(int(args[0]), int(args[1]), int(args[2]))
+    return 0
+
+
+def _cmd_config(args):
+    # Expected input: BUSSide> uart config 8 n 1
+    if len(args) != 3:
+        print("Usage: uart config <databits> <parity> <stopbits>")
+        print("Example: uart config 8 n 1")
+        return 0
+    uart_config(args[0], args[1], args[2])
+    return 0
+
+
+def _cmd_status(args):
+    if args:
+        return None
+    uart_get_status()
+    return 0
+
+
+# Dispatch keyed on the first token; each handler validates its own
+# argument count and returns None for an unrecognized form.
+_HANDLERS = {
+    "discover": _cmd_discover,
+    "passthrough": _cmd_passthrough,
+    "config": _cmd_config,
+    "status": _cmd_status,
+}
+
+
+def doCommand(command):
+    parts = command.split()
+    if not parts:
+        return None
+    handler = _HANDLERS.get(parts[0])
+    if handler is None:
+        return None
+    return handler(parts[1:])
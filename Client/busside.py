@@ -6,14 +6,18 @@ import sys
 import readline
 import traceback
 import struct
-import bs_i2c
-import bs_uart
-import bs_jtag
+import bisect
+import importlib
 import bs
-import bs_spi
 import atexit
 from pathlib import Path
 
+# Block-buffer stdout even on a tty: combined with the single-write help
+# text this turns a help screen into one syscall instead of a flush per
+# newline. The REPL flushes explicitly before each prompt.
+if hasattr(sys.stdout, "reconfigure"):
+    sys.stdout.reconfigure(line_buffering=False)
+
 # Define your directory path
 data_dir = Path(os.path.expanduser("~/.BUSSide"))
 
@@ -26,12 +30,17 @@ history_path = os.path.expanduser("~/.BUSSide/history")
 # define squence number file path
 sequence_file_path = os.path.expanduser("~/.BUSSide/sequence")
 
-# Load history if it exists
-if os.path.exists(history_path):
-    try:
-        readline.read_history_file(history_path)
-    except Exception:
-        print("--- Warning: Could not read history file.")
+# Load history; a missing file on first run is the normal case, so just
+# try the read instead of paying a stat() for an existence check first.
+try:
+    readline.read_history_file(history_path)
+except FileNotFoundError:
+    pass
+except OSError:
+    print("--- Warning: Could not read history file.")
+
+# Keep the in-memory ring (and the exit-time write) bounded.
+readline.set_history_length(1000)
 
 # Save function
 def save_history():
@@ -62,7 +71,8 @@ COMMAND_TREE = {
         'fuzz': ['<cs> <clk> <mosi> <miso>'],
         'flash': {
             'erase': {
-                'sector': ['<address>']
+                'sector': ['<address>'],
+                'range': ['<start> <count>']
             },
             'wp': ['enable', 'disable'],
             'read': {
@@ -72,7 +82,10 @@ COMMAND_TREE = {
                 'sreg2': ['<cs> <clk> <mosi> <miso>']
             },
             'dump': ['<size> <outfile>'],
-            'write': ['<size> <infile>']
+            'write': {
+                'verify': ['<size> <infile>'],
+                '<size> <infile>': []
+            }
         }
     },
     'uart': {
@@ -94,40 +107,84 @@ COMMAND_TREE = {
     'exit': []
 }
 
+class _TrieNode:
+    """One completion-tree node: exact-match children plus an optional
+    placeholder child (a '<...>' key) reached by any typed token."""
+
+    __slots__ = ("children", "placeholder_child", "sorted_keys",
+                 "sorted_keys_with_space")
+
+    def __init__(self):
+        self.children = {}
+        self.placeholder_child = None
+        self.sorted_keys = []
+        self.sorted_keys_with_space = []
+
+
+def _build_trie(spec):
+    """Normalize the mixed dict/list COMMAND_TREE shape into trie nodes.
+
+    Built once at import so completion never walks or type-checks the
+    raw tree again; list entries become leaf children with no options.
+    """
+    node = _TrieNode()
+    items = spec.items() if isinstance(spec, dict) else ((k, []) for k in spec)
+    for key, sub in items:
+        child = _build_trie(sub)
+        node.children[key] = child
+        if key.startswith('<'):
+            node.placeholder_child = child
+    node.sorted_keys = sorted(node.children)
+    # Candidates are handed to readline with a trailing space; build
+    # them once here instead of concatenating per keypress.
+    node.sorted_keys_with_space = [k + ' ' for k in node.sorted_keys]
+    return node
+
+
+_COMMAND_TRIE = _build_trie(COMMAND_TREE)
+
+
+# Last computed completion set, keyed by (line buffer, text): readline
+# calls completer() with state=0,1,2,... for one keypress, so only the
+# state=0 call should pay for the trie walk.
+_completer_cache = None
+
+
 def completer(text, state):
+    global _completer_cache
+
     buffer = readline.get_line_buffer()
+    if _completer_cache is not None and _completer_cache[:2] == (buffer, text):
+        options = _completer_cache[2]
+        if state < len(options):
+            return options[state]
+        return None
+
     parts = buffer.lstrip().split()
-    
+
     # If the buffer ends in a space, look for the NEXT word
     if buffer.endswith(' '):
         parts.append('')
 
-    node = COMMAND_TREE
-    
-    # Navigate the tree based on what is typed
-    for i in range(len(parts) - 1):
-        word = parts[i]
-        if isinstance(node, dict):
-            if word in node:
-                node = node[word]
-            # Handle cases where a key might be a placeholder like <cs>
-            elif list(node.keys())[0].startswith('<'):
-                node = node[list(node.keys())[0]]
-            else:
-                return None
-        elif isinstance(node, list):
-            # mo more options/hints
-            return None
-        else:
-            return None
+    # Descend the precompiled trie: exact child first, then the
+    # placeholder child for free-form tokens like pin numbers.
+    node = _COMMAND_TRIE
+    for word in parts[:-1]:
+        node = node.children.get(word) or node.placeholder_child
+        if node is None:
+            break
 
-    # Generate matches based on the current node
     options = []
-    if isinstance(node, dict):
-        options = [k + ' ' for k in node.keys() if k.startswith(text)]
-    elif isinstance(node, list):
-        options = [item + ' ' for item in node if item.startswith(text)]
-
+    if node is not None:
+        # The child keys are pre-sorted, so the candidates with this
+        # prefix form a contiguous run found by one binary search.
+        keys = node.sorted_keys
+        i = bisect.bisect_left(keys, text)
+        while i < len(keys) and keys[i].startswith(text):
+            options.append(node.sorted_keys_with_space[i])
+            i += 1
+
+    _completer_cache = (buffer, text, options)
     if state < len(options):
         return options[state]
     return None
@@ -136,7 +193,6 @@ def completer(text, state):
 readline.set_completer(completer)
 readline.parse_and_bind("tab: complete")
 
-from click import command
 # Ensure the Client/ directory is on sys.path when running from repo root
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "Client"))
 
@@ -148,48 +204,53 @@ if len(sys.argv) != 2:
 
 device = sys.argv[1]
 
+# Help text assembled once at import; printHelp emits it with a single
+# write instead of ~35 print calls, each its own flush on a tty.
+_HELP_TEXT = """\
++++ The BUSSide accepts the following commands
++++
+I2C Commands:
++++ BUSSide> i2c discover pinout
++++ BUSSide> i2c discover slaves <sdaPin> <sclPin>
++++ BUSSide> i2c flash dump <sdaPin> <sclPin> <slaveAddress> <addressLength> <size> <outfile>
++++ BUSSide> i2c flash write <sdaPin> <sclPin> <slaveAddress> <addressLength> <size> <infile>
++++
+JTAG Commands:
++++ BUSSide> jtag discover pinout
++++
+SPI Commands:
++++ BUSSide> spi discover pinout
++++ BUSSide> spi send default <cmdbyte1> ....
++++ BUSSide> spi send <cs> <clk> <mosi> <miso> <cmdbyte1> ....
++++ BUSSide> spi fuzz <cs> <clk> <mosi> <miso>
++++ BUSSide> spi flash erase sector <address>
++++ BUSSide> spi flash erase range <start> <count>
++++ BUSSide> spi flash wp enable|disable
++++ BUSSide> spi flash read id [<cs> <clk> <mosi> <miso>]
++++ BUSSide> spi flash read uid [<cs> <clk> <mosi> <miso>]
++++ BUSSide> spi flash read sreg1 [<cs> <clk> <mosi> <miso>]
++++ BUSSide> spi flash read sreg2 [<cs> <clk> <mosi> <miso>]
++++ BUSSide> spi flash dump <size> <outfile>
++++ BUSSide> spi flash write <size> <infile>
++++ BUSSide> spi flash write verify <size> <infile>
++++
+UART Commands:
++++ BUSSide> uart discover data
++++ BUSSide> uart discover rx
++++ BUSSide> uart discover tx <rx_gpio> <baudrate>
++++ BUSSide> uart passthrough auto
++++ BUSSide> uart passthrough <rx_gpio> <tx_gpio> <baudrate>
++++
+Other Commands:
++++ BUSSide> help - Print this help message
++++ BUSSide> Type quit, exit or hit Ctrl+D to exit.
++++
+BUSSide Shell
+"""
+
+
 def printHelp():
-    print("+++ The BUSSide accepts the following commands")
-    print("+++")
-    print("I2C Commands:")
-    print("+++ BUSSide> i2c discover pinout")
-    print("+++ BUSSide> i2c discover slaves <sdaPin> <sclPin>")
-    print(
-        "+++ BUSSide> i2c flash dump <sdaPin> <sclPin> <slaveAddress> <addressLength> <size> <outfile>"
-    )
-    print(
-        "+++ BUSSide> i2c flash write <sdaPin> <sclPin> <slaveAddress> <addressLength> <size> <infile>"
-    )
-    print("+++")
-    print("JTAG Commands:")
-    print("+++ BUSSide> jtag discover pinout")
-    print("+++")
-    print("SPI Commands:")
-    print("+++ BUSSide> spi discover pinout")
-    print("+++ BUSSide> spi send default <cmdbyte1> ....")
-    print("+++ BUSSide> spi send <cs> <clk> <mosi> <miso> <cmdbyte1> ....")
-    print("+++ BUSSide> spi fuzz <cs> <clk> <mosi> <miso>")
-    print("+++ BUSSide> spi flash erase sector <address>")
-    print("+++ BUSSide> spi flash wp enable|disable")
-    print("+++ BUSSide> spi flash read id [<cs> <clk> <mosi> <miso>]")
-    print("+++ BUSSide> spi flash read uid [<cs> <clk> <mosi> <miso>]")
-    print("+++ BUSSide> spi flash read sreg1 [<cs> <clk> <mosi> <miso>]")
-    print("+++ BUSSide> spi flash read sreg2 [<cs> <clk> <mosi> <miso>]")
-    print("+++ BUSSide> spi flash dump <size> <outfile>")
-    print("+++ BUSSide> spi flash write <size> <infile>")
-    print("+++")
-    print("UART Commands:")
-    print("+++ BUSSide> uart discover data")
-    print("+++ BUSSide> uart discover rx")
-    print("+++ BUSSide> uart discover tx <rx_gpio> <baudrate>")
-    print("+++ BUSSide> uart passthrough auto")
-    print("+++ BUSSide> uart passthrough <rx_gpio> <tx_gpio> <baudrate>")
-    print("+++")
-    print("Other Commands:")
-    print("+++ BUSSide> help - Print this help message")
-    print("+++ BUSSide> Type quit, exit or hit Ctrl+D to exit.")
-    print("+++")
-    print("BUSSide Shell")
+    sys.stdout.write(_HELP_TEXT)
 
 def reset_terminal():
     """
@@ -207,56 +268,100 @@ def reset_terminal():
 
     printHelp()
 
+# Sub-module dispatch keyed on the leading protocol token. Entries start
+# as module names and are swapped for the real doCommand callable on
+# first use, so startup only pays for the protocols actually exercised.
+_DISPATCH = {
+    "spi": "bs_spi",
+    "i2c": "bs_i2c",
+    "uart": "bs_uart",
+    "jtag": "bs_jtag",
+}
+
+
+def _resolve_handler(head):
+    handler = _DISPATCH.get(head)
+    if isinstance(handler, str):
+        handler = importlib.import_module(handler).doCommand
+        _DISPATCH[head] = handler
+    return handler
+
+# One C-level multi-prefix test rejects unknown commands before any
+# splitting or hashing happens.
+_PREFIXES = ("spi ", "i2c ", "uart ", "jtag ")
+
+# Echo-handshake payload, serialized once; requestreply skips its
+# per-call struct.pack when handed the ready-made bytes.
+_SYNC_MAGIC = [0x12345678]
+_SYNC_BYTES = struct.pack("<I", 0x12345678)
+
+# Handshake gating: the echo sync is only needed after something went
+# wrong (timeout, interrupt, failed sub-command), not before every
+# command on a healthy link. Starts dirty so the first command syncs.
+_device_needs_resync = True
+
+
 def doCommand(command):
+    global _device_needs_resync
+
     # Check for quit, exit or help as the first step before doing anything else.
     # This prevents the printhelp, device reset, and the hardware sync from ever running
-    if command.strip().lower() in ["quit", "exit"]:
+    normalized = command.strip().lower()
+    if normalized in ("quit", "exit"):
         return -1
-    
-    if command.strip().lower() == "help":
+
+    if normalized == "help":
         printHelp()
         return True # Return True so the main loop knows it was handled
 
-    # Hardware Commands (Reset + Sync)
-    print(f"+++ Syncing NodeMCU for Command: <{command}>...")
-    
-    # Trigger the hardware reset
-    #bs.ResetDevice()
-
-    # Perform the handshake
-    bs.FlushInput()
-    bs.NewTimeout(30)
-    sync_result = bs.requestreply(0, [0x12345678])
-    
-    if sync_result is None:
-        print("--- Error: Device failed to sync after reset.")
+    if not command.startswith(_PREFIXES):
         return None
-    bs.FlushInput()
-    bs.NewTimeout(30)
 
-    sync_result = bs.requestreply(0, [0x12345678])  # BS_ECHO
-    if sync_result is None:
-        return None
-    
+    if _device_needs_resync:
+        # Hardware Commands (Reset + Sync)
+        print(f"+++ Syncing NodeMCU for Command: <{command}>...")
+
+        # Trigger the hardware reset
+        #bs.ResetDevice()
+
+        # Perform the handshake (one echo round trip is enough; a second
+        # sync straight after a validated first one is pure duplicated I/O)
+        bs.FlushInput()
+        bs.NewTimeout(30)
+        sync_result = bs.requestreply(0, _SYNC_MAGIC, request_bytes=_SYNC_BYTES)  # BS_ECHO
+
+        if sync_result is None:
+            print("--- Error: Device failed to sync after reset.")
+            return None
+        _device_needs_resync = False
+
     # Route to sub-modules
-    if command.find("spi ") == 0:
-        return bs_spi.doCommand(command[4:])
-    elif command.find("i2c ") == 0:
-        return bs_i2c.doCommand(command[4:])
-    elif command.find("uart ") == 0:
-        return bs_uart.doCommand(command[5:])
-    elif command.find("jtag ") == 0:
-        return bs_jtag.doCommand(command[5:])
-    else:
+    head, _, rest = command.partition(" ")
+    handler = _resolve_handler(head)
+    if handler is None or not rest:
         return None
-
+    # Push any buffered status lines out before the (possibly long)
+    # sub-command runs; stdout is block-buffered.
+    sys.stdout.flush()
+    rv = handler(rest)
+    if rv is None:
+        # The sub-module failed or timed out; handshake again before
+        # the next command in case the device is wedged.
+        _device_needs_resync = True
+    return rv
+
+# Fixed-size read through the raw fd: no Python file-object allocation,
+# and a missing/short file simply leaves the default sequence in place.
 try:
-    with open(sequence_file_path, "rb") as f:
-        d = f.read(4)
-        if len(d) == 4:
-            (seq,) = struct.unpack("<I", d)
-            bs.set_sequence_number(seq)
-except Exception:
+    fd = os.open(sequence_file_path, os.O_RDONLY)
+    try:
+        d = os.read(fd, 4)
+    finally:
+        os.close(fd)
+    if len(d) == 4:
+        (seq,) = struct.unpack("<I", d)
+        bs.set_sequence_number(seq)
+except OSError:
     pass
 
 rv = bs.Connect(device)
@@ -272,6 +377,8 @@ printHelp()
 
 while True:
     try:
+        # Make sure all buffered output is visible before prompting
+        sys.stdout.flush()
         # Capture the input
         command = input("BUSSide> ").strip()
         if not command:
@@ -289,24 +396,28 @@ while True:
 
     except KeyboardInterrupt:
         # User hit Ctrl+C during input OR during doCommand
+        _device_needs_resync = True
         bs.ResetDevice()
         reset_terminal()
         print("+++ Interrupted. (Type 'quit' or hit Ctrl+D to exit safely)")
         # Continue so a stray Ctrl+C doesn't kill the session
-        continue 
+        continue
     except EOFError:
         # User hit Ctrl+D
         break
     except Exception:
+        _device_needs_resync = True
         print("\n--- ERROR: Unexpected Exception:")
         traceback.print_exc()
         continue
 # The single, clean exit point
 print("Cleaning up and exiting... Ciao!")
+# Turn off LED blinking before exiting; this used to sit after
+# sys.exit(0) where it could never run.
+try:
+    bs.set_led_blink(0)
+except Exception:
+    pass
 reset_terminal()
 # Saves history and seq files automatically here if using sys.exit
 sys.exit(0)
-
-# Turn off LED blinking when exiting normally (not quit)
-bs.set_led_blink(0)
-print("Ciao!")
@@ -1,14 +1,17 @@
-import serial
 import time
 import bs
 
 # 1. Match the speed exactly
 BAUD = 115200
-ser = serial.Serial("/dev/ttyUSB0", BAUD, timeout=1, dsrdtr=False, rtscts=False)
 
-# Connect to BUSSide
+# Connect to BUSSide and reuse its port handle. Opening the same tty a
+# second time with serial.Serial raced this handle on reads and DTR
+# state and triggered a second NodeMCU reset with its own settle time.
 bs.Connect("/dev/ttyUSB0")
 bs.set_led_blink(6000)  # 6 seconds for pulse test
+ser = bs.getSerial()
+ser.timeout = 1
+ser.baudrate = BAUD
 
 # 2. Wait for the 'Welcome' garbage to finish
 
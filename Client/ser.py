@@ -1,4 +1,5 @@
 import serial
+import selectors
 import time
 import bs
 
@@ -27,10 +28,14 @@ try:
     time.sleep(1)
 
     print("Listening for data...")
+    # Sleep in epoll/kqueue until the port is actually readable; the 1 s
+    # timeout keeps Ctrl+C responsive without waking for idle lines.
+    sel = selectors.DefaultSelector()
+    sel.register(ser.fileno(), selectors.EVENT_READ)
     while True:
-        if ser.in_waiting > 0:
-            raw = ser.read(ser.in_waiting)
-            print(f"Hex: {raw.hex()} | Text: {raw.decode('ascii', errors='replace')}")
-        time.sleep(0.1)
+        if not sel.select(timeout=1.0):
+            continue
+        raw = ser.read(ser.in_waiting or 1)
+        print(f"Hex: {raw.hex()} | Text: {raw.decode('ascii', errors='replace')}")
 except KeyboardInterrupt:
     ser.close()